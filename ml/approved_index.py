@@ -0,0 +1,98 @@
+"""On-disk vector index of the approved catalog used for mlSimilar lookups.
+
+The TF-IDF matrix of every approved tool is stored as a sparse ``.npz`` next to
+a metadata ``.npy`` (name, domain slug per row). Files are keyed by a content
+hash of the catalog plus the model version and model file, so an unchanged
+catalog scored with an unchanged model is loaded instead of re-vectorized.
+"""
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+INDEX_DIR = Path('ml/cache')
+INDEX_PREFIX = 'approved-'
+
+
+@dataclass
+class ApprovedIndex:
+    key: str
+    names: np.ndarray
+    domain_slugs: np.ndarray
+    vectors: sparse.csr_matrix
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def index_key(approved_path: Path, model_path: Path, model_version: str) -> str:
+    h = hashlib.sha256()
+    h.update(file_digest(approved_path).encode())
+    h.update(model_version.encode())
+    h.update(file_digest(model_path).encode())
+    return h.hexdigest()[:16]
+
+
+def _paths(key: str, index_dir: Path):
+    return (index_dir / f'{INDEX_PREFIX}{key}.npz',
+            index_dir / f'{INDEX_PREFIX}{key}.meta.npy')
+
+
+def load_index(key: str, index_dir: Path = INDEX_DIR):
+    vec_path, meta_path = _paths(key, index_dir)
+    if not (vec_path.exists() and meta_path.exists()):
+        return None
+    meta = np.load(meta_path)
+    return ApprovedIndex(key, meta['name'], meta['domainSlug'], sparse.load_npz(vec_path).tocsr())
+
+
+def save_index(index: ApprovedIndex, index_dir: Path = INDEX_DIR) -> None:
+    index_dir.mkdir(parents=True, exist_ok=True)
+    vec_path, meta_path = _paths(index.key, index_dir)
+    meta = np.empty(len(index.names), dtype=[
+        ('name', index.names.dtype), ('domainSlug', index.domain_slugs.dtype)])
+    meta['name'] = index.names
+    meta['domainSlug'] = index.domain_slugs
+    # Write under temp names first so a crashed run never leaves a half index.
+    tmp_vec = vec_path.with_name(vec_path.stem + '.tmp.npz')
+    tmp_meta = meta_path.with_name(meta_path.stem + '.tmp.npy')
+    sparse.save_npz(tmp_vec, index.vectors)
+    np.save(tmp_meta, meta)
+    os.replace(tmp_vec, vec_path)
+    os.replace(tmp_meta, meta_path)
+    # Only the latest catalog/model combination is worth keeping around.
+    for stale in index_dir.glob(f'{INDEX_PREFIX}*'):
+        if stale not in (vec_path, meta_path):
+            stale.unlink()
+
+
+def build_index(key: str, vectorizer, items) -> ApprovedIndex:
+    names = np.array([it['name'] or '' for it in items], dtype=str)
+    slugs = np.array([it['domainSlug'] or '' for it in items], dtype=str)
+    vectors = vectorizer.transform([it['text'] for it in items]).tocsr()
+    return ApprovedIndex(key, names, slugs, vectors)
+
+
+def load_or_build(vectorizer, load_items, approved_path: Path, model_path: Path,
+                  model_version: str, index_dir: Path = INDEX_DIR, rebuild: bool = False):
+    """Return ``(index, built)``; ``load_items`` is only called on a cache miss."""
+    key = index_key(approved_path, model_path, model_version)
+    if not rebuild:
+        index = load_index(key, index_dir)
+        if index is not None:
+            return index, False
+    index = build_index(key, vectorizer, load_items())
+    save_index(index, index_dir)
+    return index, True
+
@@ -0,0 +1,94 @@
+"""Recall-vs-latency report for the mlSimilar neighbour backends.
+
+Builds one catalog from the live tools.json plus its backups and the
+non-product archive (or any ``--catalog`` files), queries it with the pending
+candidates and compares each reduced-dense (``svd``) configuration against
+exact search.
+
+Recall@k counts an approximate hit when its score reaches the exact k-th best
+score, so duplicate rows across backups do not count as misses.
+
+Usage:
+  python ml/bench_neighbors.py [--catalog public/tools.json ...] [--out report.md]
+"""
+import argparse
+import time
+from glob import glob
+from pathlib import Path
+
+import joblib
+
+from json_stream import iter_pending_items, iter_section_tools
+from neighbors import TOP_K, ExactSearch, ReducedDenseSearch
+from score_candidates import CANDIDATES_PATH, MODEL_PATH, to_text
+
+DEFAULT_CATALOGS = ['public/tools.json', *sorted(glob('public/tools.*backup*.json')),
+                    'public/non_product_archive.json']
+# (n_components, n_candidates)
+SVD_CONFIGS = [(64, 32), (64, 128), (128, 128), (256, 128), (256, 512)]
+
+
+def catalog_texts(path):
+    return [to_text(t.get('name'), t.get('description'), t.get('tags')) for _, t in iter_section_tools(path)]
+
+
+def candidate_texts(path):
+    return [to_text(c.get('name'), c.get('description'), c.get('tags')) for c in iter_pending_items(path)]
+
+
+def timed_query(search, X, k):
+    t0 = time.perf_counter()
+    res = search.query(X, k)
+    return res, (time.perf_counter() - t0) * 1000 / max(1, X.shape[0])
+
+
+def recall(exact, approx, k):
+    hits = 0
+    for (_, e_scores), (_, a_scores) in zip(exact, approx):
+        floor = e_scores[-1] - 1e-9 if len(e_scores) else 0.0
+        hits += sum(1 for s in a_scores[:k] if s >= floor)
+    return hits / max(1, k * len(exact))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare exact vs approximate neighbour search.')
+    parser.add_argument('--catalog', action='append', help='Catalog JSON to index (repeatable).')
+    parser.add_argument('--k', type=int, default=TOP_K)
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Tile the catalog N times to preview latency at archive scale.')
+    parser.add_argument('--out', help='Also write the markdown report to this path.')
+    args = parser.parse_args()
+
+    model = joblib.load(MODEL_PATH)
+    vectorizer = model['tfidf']
+    texts = [t for path in (args.catalog or DEFAULT_CATALOGS) for t in catalog_texts(path)]
+    texts *= max(1, args.repeat)
+    vectors = vectorizer.transform(texts).tocsr()
+    X = vectorizer.transform(candidate_texts(CANDIDATES_PATH)).tocsr()
+
+    exact, exact_ms = timed_query(ExactSearch(vectors), X, args.k)
+    lines = [
+        '# mlSimilar neighbour search: recall vs latency',
+        '',
+        f'Catalog rows: {vectors.shape[0]}; queries: {X.shape[0]}; k={args.k}',
+        '',
+        'Backend | Build ms | Query ms/row | Recall@k | Speedup',
+        '------- | -------- | ------------ | -------- | -------',
+        f'exact | 0 | {exact_ms:.3f} | 1.000 | 1.0x',
+    ]
+    for n_components, n_candidates in SVD_CONFIGS:
+        t0 = time.perf_counter()
+        search = ReducedDenseSearch(vectors, n_components=n_components, n_candidates=n_candidates)
+        build_ms = (time.perf_counter() - t0) * 1000
+        approx, ms = timed_query(search, X, args.k)
+        lines.append(f'svd dims={n_components} candidates={n_candidates} | {build_ms:.0f} | {ms:.3f} | '
+                     f'{recall(exact, approx, args.k):.3f} | {exact_ms / ms:.1f}x')
+
+    report = '\n'.join(lines) + '\n'
+    print(report)
+    if args.out:
+        Path(args.out).write_text(report, encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
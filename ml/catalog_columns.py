@@ -0,0 +1,419 @@
+"""Compact columnar build of public/tools.json, read through mmap.
+
+Most Python consumers of the catalog (``load_approved()``, the dedup and
+near-duplicate passes) only need names, slugs, tags and links, yet every one
+of them re-parses the whole pretty-printed JSON, ``about``/``pros``/``cons``
+included. The build writes one file holding the same catalog as columns:
+
+  header        magic, then a JSON header: source sha256, row counts and the
+                (offset, dtype, count) of every section below
+  string column ``<col>.offsets`` (uint32, rows + 1) into ``<col>.blob`` (UTF-8)
+  domain.*      name, slug, description, icon per domain, plus ``present``/``extra``
+  tool.domain   uint16 index into the domain table per tool
+  tags          interned tag table; per tool ``tool.tags.offsets`` into uint16 ``tool.tags.ids``
+  tool.*        name, description, link, iconUrl, about (string columns);
+                pros, cons (per-tool offsets into an item string column);
+                ``present`` (bitmask of TOOL_FIELDS) and ``extra`` (JSON of
+                any other keys)
+
+A field's ``present`` bit is set only when its value is held in the column (a
+string, or a list of strings); nulls, values of any other type and unknown
+keys go to the row's ``extra`` JSON, and a missing key is in neither. Readers
+get the original value (``None`` for a missing key), so ``to_catalog()``
+gives back tools.json exactly.
+
+Sections are views on the mapped file; a string is decoded only when it is
+read, so projecting ``name``/``domainSlug``/``tags`` never touches the long
+text columns.
+
+Usage:
+  python ml/catalog_columns.py            # build ml/cache/tools.columns
+  python ml/catalog_columns.py --verify   # build, check the round trip and compare load time
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from approved_index import INDEX_DIR, file_digest
+
+SOURCE_PATH = Path('public/tools.json')
+COLUMNS_PATH = INDEX_DIR / 'tools.columns'
+MAGIC = b'TOOLCOL1'
+# Stored in the header; files of another version are rebuilt by load_or_build().
+FORMAT_VERSION = 2
+DOMAIN_FIELDS = ('name', 'slug', 'description', 'icon')
+TOOL_FIELDS = ('name', 'description', 'link', 'tags', 'iconUrl', 'about', 'pros', 'cons')
+STRING_FIELDS = ('name', 'description', 'link', 'iconUrl', 'about')
+LIST_FIELDS = ('pros', 'cons')
+# Per-tool columns derived from the domain table.
+DOMAIN_COLUMNS = {'domainSlug': 'slug', 'domainName': 'name'}
+_ALIGN = 8
+
+
+class StringColumn:
+    """Strings stored as offsets into a UTF-8 blob; each is decoded on access."""
+
+    def __init__(self, buf, offsets, blob_start):
+        self.buf = buf
+        self.offsets = offsets
+        self.blob_start = blob_start
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start = self.blob_start + int(self.offsets[i])
+        return self.buf[start:self.blob_start + int(self.offsets[i + 1])].decode('utf-8')
+
+    def __iter__(self):
+        offsets = self.offsets.tolist()
+        blob = self.buf[self.blob_start:self.blob_start + offsets[-1]]
+        return (blob[a:b].decode('utf-8') for a, b in zip(offsets, offsets[1:]))
+
+
+class ListColumn:
+    """Per-row lists: ``offsets`` (rows + 1) into ``items``, any indexable."""
+
+    def __init__(self, offsets, items):
+        self.offsets = offsets
+        self.items = items
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return [self.items[j] for j in range(int(self.offsets[i]), int(self.offsets[i + 1]))]
+
+    def __iter__(self):
+        offsets = self.offsets.tolist()
+        items = list(self.items)
+        return (items[a:b] for a, b in zip(offsets, offsets[1:]))
+
+
+class MaskedColumn:
+    """A column whose rows without the field's ``present`` bit come from ``fallback(row)``."""
+
+    def __init__(self, col, mask, bit, fallback):
+        self.col = col
+        self.mask = mask
+        self.bit = bit
+        self.fallback = fallback
+
+    def __len__(self):
+        return len(self.col)
+
+    def __getitem__(self, i):
+        return self.col[i] if self.mask[i] >> self.bit & 1 else self.fallback(i)
+
+    def __iter__(self):
+        bit = self.bit
+        return (v if m >> bit & 1 else self.fallback(i)
+                for i, (v, m) in enumerate(zip(self.col, self.mask.tolist())))
+
+
+class InternedColumn:
+    """One value per row looked up in a small table by index."""
+
+    def __init__(self, ids, table):
+        self.ids = ids
+        self.table = list(table)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        return self.table[self.ids[i]]
+
+    def __iter__(self):
+        return (self.table[i] for i in self.ids.tolist())
+
+
+class _Writer:
+    def __init__(self):
+        self.sections = {}
+        self.chunks = []
+        self.size = 0
+
+    def array(self, name, values, dtype):
+        arr = np.asarray(values, dtype=dtype)
+        self._add(name, arr.tobytes(), arr.dtype.str, len(arr))
+
+    def strings(self, name, values):
+        # None marks a row whose value is not in this column (see ``present``); it takes no bytes.
+        encoded = [(v or '').encode('utf-8') for v in values]
+        offsets = np.cumsum([0] + [len(b) for b in encoded], dtype=np.int64)
+        if offsets[-1] > np.iinfo(np.uint32).max:
+            raise ValueError(f'{name}: string blob exceeds 4 GiB')
+        offsets = offsets.astype(np.uint32)
+        self._add(f'{name}.offsets', offsets.tobytes(), offsets.dtype.str, len(offsets))
+        self._add(f'{name}.blob', b''.join(encoded), '|u1', int(offsets[-1]))
+
+    def _add(self, name, data, dtype, count):
+        pad = -self.size % _ALIGN
+        self.chunks.append(b'\0' * pad + data)
+        self.size += pad
+        self.sections[name] = [self.size, dtype, count]
+        self.size += len(data)
+
+
+def _columnar(field, value):
+    """Whether ``value`` fits its column; anything else is kept in ``extra``."""
+    if field in ('tags',) + LIST_FIELDS:
+        return isinstance(value, list) and all(isinstance(v, str) for v in value)
+    return isinstance(value, str)
+
+
+def _split(obj, fields, skip=()):
+    """(bitmask of ``fields`` held in columns, JSON of every other key or '')."""
+    mask, rest = 0, {}
+    for k, v in obj.items():
+        if k in skip:
+            continue
+        if k in fields and _columnar(k, v):
+            mask |= 1 << fields.index(k)
+        else:
+            rest[k] = v
+    return mask, json.dumps(rest, ensure_ascii=False, separators=(',', ':')) if rest else ''
+
+
+def _stored(obj, field, default=None):
+    value = obj.get(field)
+    return value if _columnar(field, value) else default
+
+
+def _ids(values, limit=0xFFFF):
+    if len(values) > limit:
+        raise ValueError(f'{len(values)} distinct values do not fit a uint16 id')
+    return values
+
+
+def build(source: Path = SOURCE_PATH, out: Path = COLUMNS_PATH) -> Path:
+    with open(source, encoding='utf-8') as f:
+        domains = _ids(json.load(f))
+    tools = [(d, t) for d, domain in enumerate(domains) for t in domain.get('tools', [])]
+    tag_ids = {}
+    for _, t in tools:
+        for tag in _stored(t, 'tags', []):
+            tag_ids.setdefault(tag, len(tag_ids))
+
+    w = _Writer()
+    domain_split = [_split(d, DOMAIN_FIELDS, skip=('tools',)) for d in domains]
+    w.array('domain.present', [mask for mask, _ in domain_split], np.uint8)
+    for field in DOMAIN_FIELDS:
+        w.strings(f'domain.{field}', [_stored(d, field) for d in domains])
+    w.strings('domain.extra', [extra for _, extra in domain_split])
+    tool_split = [_split(t, TOOL_FIELDS) for _, t in tools]
+    w.array('tool.domain', [d for d, _ in tools], np.uint16)
+    w.array('tool.present', [mask for mask, _ in tool_split], np.uint8)
+    for field in STRING_FIELDS:
+        w.strings(f'tool.{field}', [_stored(t, field) for _, t in tools])
+    w.strings('tags', _ids(list(tag_ids)))
+    w.array('tool.tags.offsets', np.cumsum([0] + [len(_stored(t, 'tags', [])) for _, t in tools]), np.uint32)
+    w.array('tool.tags.ids', [tag_ids[tag] for _, t in tools for tag in _stored(t, 'tags', [])], np.uint16)
+    for field in LIST_FIELDS:
+        w.array(f'tool.{field}.offsets', np.cumsum([0] + [len(_stored(t, field, [])) for _, t in tools]), np.uint32)
+        w.strings(f'tool.{field}.items', [item for _, t in tools for item in _stored(t, field, [])])
+    w.strings('tool.extra', [extra for _, extra in tool_split])
+
+    header = json.dumps({'version': FORMAT_VERSION, 'source': str(source), 'sha256': file_digest(source),
+                         'domains': len(domains), 'tools': len(tools), 'sections': w.sections},
+                        separators=(',', ':')).encode('utf-8')
+    head = MAGIC + struct.pack('<I', len(header)) + header
+    head += b'\0' * (-len(head) % _ALIGN)
+    # Section offsets are relative to the end of the header.
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(head)
+        for chunk in w.chunks:
+            f.write(chunk)
+    os.replace(tmp, out)
+    return out
+
+
+class CatalogColumns:
+    def __init__(self, path: Path = COLUMNS_PATH):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buf[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{self.path} is not a tools.columns file')
+        (size,) = struct.unpack_from('<I', self.buf, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(self.buf[start:start + size])
+        self.base = start + size + (-(start + size) % _ALIGN)
+        self._cache = {}
+
+    def __len__(self):
+        return self.header['tools']
+
+    def close(self):
+        self._cache.clear()
+        self.buf.close()
+
+    def _array(self, name):
+        offset, dtype, count = self.header['sections'][name]
+        return np.frombuffer(self.buf, dtype=np.dtype(dtype), count=count, offset=self.base + offset)
+
+    def _strings(self, name):
+        blob_offset = self.header['sections'][f'{name}.blob'][0]
+        return StringColumn(self.buf, self._array(f'{name}.offsets'), self.base + blob_offset)
+
+    def _extra(self, table, i):
+        return json.loads(self._strings(f'{table}.extra')[i] or '{}')
+
+    def _domain_values(self, field):
+        """``field`` of every domain, as in tools.json (None when absent)."""
+        bit = DOMAIN_FIELDS.index(field)
+        return list(MaskedColumn(self._strings(f'domain.{field}'), self._array('domain.present'), bit,
+                                 lambda i: self._extra('domain', i).get(field)))
+
+    def column(self, name):
+        """One per-tool column: a TOOL_FIELDS key, ``domainSlug`` or ``domainName``."""
+        if name not in self._cache:
+            if name in STRING_FIELDS:
+                col = self._strings(f'tool.{name}')
+            elif name == 'tags':
+                col = ListColumn(self._array('tool.tags.offsets'),
+                                 InternedColumn(self._array('tool.tags.ids'), self._strings('tags')))
+            elif name in LIST_FIELDS:
+                col = ListColumn(self._array(f'tool.{name}.offsets'), self._strings(f'tool.{name}.items'))
+            elif name in DOMAIN_COLUMNS:
+                col = InternedColumn(self._array('tool.domain'), self._domain_values(DOMAIN_COLUMNS[name]))
+            else:
+                raise KeyError(f'No column {name!r} (have {", ".join(TOOL_FIELDS + tuple(DOMAIN_COLUMNS))})')
+            if name in TOOL_FIELDS:
+                col = MaskedColumn(col, self._array('tool.present'), TOOL_FIELDS.index(name),
+                                   lambda i, name=name: self._extra('tool', i).get(name))
+            self._cache[name] = col
+        return self._cache[name]
+
+    def project(self, columns):
+        """Yield one dict per tool holding only ``columns``."""
+        for values in zip(*(self.column(name) for name in columns)):
+            yield dict(zip(columns, values))
+
+    def to_catalog(self):
+        """The full tools.json structure, for checking the build."""
+        domains = []
+        present = self._array('domain.present')
+        for i in range(self.header['domains']):
+            domain = {f: self._strings(f'domain.{f}')[i] for n, f in enumerate(DOMAIN_FIELDS) if present[i] >> n & 1}
+            domain.update(self._extra('domain', i))
+            domain['tools'] = []
+            domains.append(domain)
+        present = self._array('tool.present')
+        for i, d in enumerate(self._array('tool.domain').tolist()):
+            tool = {f: self.column(f)[i] for n, f in enumerate(TOOL_FIELDS) if present[i] >> n & 1}
+            tool.update(self._extra('tool', i))
+            domains[d]['tools'].append(tool)
+        return domains
+
+
+def open_columns(path: Path = COLUMNS_PATH, source: Path = SOURCE_PATH):
+    """The columnar catalog, or None when it is missing, of another format version or
+    was built from another ``source``."""
+    if not path.exists():
+        return None
+    catalog = CatalogColumns(path)
+    if catalog.header.get('version') != FORMAT_VERSION or (
+            source is not None and catalog.header['sha256'] != file_digest(source)):
+        catalog.close()
+        return None
+    return catalog
+
+
+def load_or_build(path: Path = COLUMNS_PATH, source: Path = SOURCE_PATH):
+    """Return ``(catalog, built)``, rebuilding when ``source`` changed."""
+    catalog = open_columns(path, source)
+    if catalog is not None:
+        return catalog, False
+    build(source, path)
+    return CatalogColumns(path), True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the columnar catalog from tools.json.')
+    parser.add_argument('--source', type=Path, default=SOURCE_PATH)
+    parser.add_argument('--out', type=Path, default=COLUMNS_PATH)
+    parser.add_argument('--verify', action='store_true',
+                        help='Check that the build round-trips to the source and compare load times.')
+    args = parser.parse_args()
+
+    build(args.source, args.out)
+    print(f"Wrote {args.out} ({args.out.stat().st_size / 1024:.0f} KiB; "
+          f"{args.source} is {args.source.stat().st_size / 1024:.0f} KiB)")
+    if not args.verify:
+        return
+
+    catalog = CatalogColumns(args.out)
+    with open(args.source, encoding='utf-8') as f:
+        same = catalog.to_catalog() == json.load(f)
+    print(f"Round trip of {len(catalog)} tools: {'identical' if same else 'MISMATCH'}")
+    catalog.close()
+    edge_same = _round_trips(_EDGE_CASES)
+    print(f"Round trip of nulls, missing keys and odd types: {'identical' if edge_same else 'MISMATCH'}")
+    same = same and edge_same
+    columns = ('name', 'domainSlug', 'tags', 'link')
+
+    def from_json():
+        with open(args.source, encoding='utf-8') as f:
+            return [{'name': t.get('name'), 'domainSlug': d.get('slug'), 'tags': t.get('tags'),
+                     'link': t.get('link')} for d in json.load(f) for t in d.get('tools', [])]
+
+    def from_columns():
+        c = CatalogColumns(args.out)
+        try:
+            return list(c.project(columns))
+        finally:
+            c.close()
+
+    for label, fn in (('json.load', from_json), ('columns', from_columns)):
+        best = min(_timed(fn) for _ in range(5))
+        print(f"  {label:<10} {', '.join(columns)}: {best:.1f}ms (best of 5)")
+    if not same:
+        raise SystemExit(1)
+
+
+# Catalog shapes tools.json does not use today but the build must still preserve.
+_EDGE_CASES = [
+    {'name': 'D', 'slug': 'd', 'tools': [
+        {'name': 'A', 'description': None},
+        {'name': 'B', 'tags': None, 'pros': ['x', 1], 'iconUrl': 7},
+        {'description': '', 'tags': [], 'link': 'https://example.com'},
+    ]},
+    {'slug': None, 'icon': {'emoji': '*'}, 'tools': []},
+]
+
+
+def _round_trips(data):
+    """Whether ``data`` comes back unchanged from a build, and reads as it should by column."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source, out = Path(tmp) / 'tools.json', Path(tmp) / 'tools.columns'
+        source.write_text(json.dumps(data), encoding='utf-8')
+        build(source, out)
+        catalog = CatalogColumns(out)
+        try:
+            tools = [(d.get('slug'), t) for d in data for t in d.get('tools', [])]
+            by_column = [{'domainSlug': slug, **{f: t.get(f) for f in TOOL_FIELDS}} for slug, t in tools]
+            return (catalog.to_catalog() == data
+                    and list(catalog.project(('domainSlug',) + TOOL_FIELDS)) == by_column)
+        finally:
+            catalog.close()
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""Compact, memory-mappable export of the v1 TF-IDF + LogisticRegression model.
+
+``joblib.load(ml/model_v1.joblib)`` unpickles a 50k-entry bigram vocabulary
+dict and imports scikit-learn before the first candidate can be scored. The
+compact export stores the same model as flat arrays:
+
+  vocab_offsets.npy  uint32 offsets (terms + 1) of each term in vocab_blob.npy
+  vocab_blob.npy     UTF-8 terms back to back in byte order (= code point order),
+                     found by binary search over the offsets
+  columns.npy    feature column of each sorted term
+  idf.npy        idf weight per column
+  coef.npy       classifier coefficients, shape (1, n_features)
+  intercept.npy  classifier intercept
+  meta.json      analyzer settings, classes and the sha256 of the source .joblib
+
+All arrays load with ``np.load(mmap_mode='r')`` and the transform repeats the
+scikit-learn arithmetic step for step, so scores match the joblib model exactly.
+The export is not necessarily smaller than the .joblib file: idf, coefficients
+and columns take 20 bytes per term on top of the term text, as float64/int32
+arrays much like the pickle's. What it saves is the unpickling at startup; the
+size of each file is printed after every export.
+
+Usage:
+  python ml/compact_model.py              # export ml/model_v1.joblib
+  python ml/compact_model.py --benchmark  # export, verify and compare startup time
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+from bisect import bisect_left
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from scipy.special import expit
+
+from approved_index import file_digest
+
+COMPACT_DIR = Path('ml/model_v1.compact')
+_SOURCE_MODEL = Path('ml/model_v1.joblib')
+
+
+class PackedTerms:
+    """Sorted byte strings stored as offsets into one blob, searched by bisection."""
+
+    def __init__(self, offsets, blob):
+        # A list and a bytes object compare far faster than per-item numpy slices.
+        self.offsets = offsets.tolist()
+        self.blob = blob.tobytes()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]]
+
+    def find(self, term):
+        """Position of ``term`` (bytes), or -1 when it is not in the table."""
+        i = bisect_left(self, term)
+        return i if i < len(self) and self[i] == term else -1
+
+
+class CompactVectorizer:
+    def __init__(self, meta, vocab, columns, idf):
+        self.lowercase = meta['lowercase']
+        self.token_re = re.compile(meta['token_pattern'])
+        self.min_n, self.max_n = meta['ngram_range']
+        self.sublinear_tf = meta['sublinear_tf']
+        self.norm = meta['norm']
+        self.vocab = vocab
+        self.columns = columns
+        self.idf = idf
+
+    def analyze(self, doc):
+        # Same steps as TfidfVectorizer's word analyzer: lowercase, regex
+        # tokens, then word n-grams in sklearn's order.
+        if self.lowercase:
+            doc = doc.lower()
+        tokens = self.token_re.findall(doc)
+        if self.max_n == 1:
+            return tokens
+        min_n = self.min_n
+        grams = list(tokens) if min_n == 1 else []
+        if min_n == 1:
+            min_n += 1
+        for n in range(min_n, min(self.max_n + 1, len(tokens) + 1)):
+            for i in range(len(tokens) - n + 1):
+                grams.append(' '.join(tokens[i:i + n]))
+        return grams
+
+    def transform(self, texts):
+        rows, terms = [], []
+        for r, doc in enumerate(texts):
+            grams = self.analyze(doc)
+            terms.extend(grams)
+            rows.extend([r] * len(grams))
+        n_docs = len(texts)
+        if terms:
+            found = {t: self.vocab.find(t.encode('utf-8')) for t in set(terms)}
+            pos = np.fromiter((found[t] for t in terms), dtype=np.int64, count=len(terms))
+            known = pos >= 0
+            rows = np.asarray(rows)[known]
+            cols = self.columns[pos[known]]
+        else:
+            rows = cols = np.empty(0, dtype=np.int32)
+        # COO -> CSR sums the per-term counts and sorts indices, like _count_vocab.
+        X = sparse.csr_matrix((np.ones(len(rows), dtype=np.float64), (rows, cols)),
+                              shape=(n_docs, len(self.idf)))
+        X.sum_duplicates()
+        if self.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1.0
+        X.data *= self.idf[X.indices]
+        if self.norm == 'l2':
+            _normalize_l2(X)
+        return X
+
+
+def _normalize_l2(X):
+    """In-place row L2 normalisation summing squares left to right per row,
+    as sklearn's inplace_csr_row_normalize_l2 does, so results are bit-equal."""
+    lengths = np.diff(X.indptr)
+    sums = np.zeros(X.shape[0])
+    sq = X.data * X.data
+    for k in range(int(lengths.max(initial=0))):
+        live = np.flatnonzero(lengths > k)
+        sums[live] += sq[X.indptr[live] + k]
+    norms = np.sqrt(sums)
+    norms[norms == 0.0] = 1.0
+    X.data /= np.repeat(norms, lengths)
+
+
+class CompactClassifier:
+    def __init__(self, meta, coef, intercept):
+        self.classes_ = np.asarray(meta['classes'])
+        self.coef_T = coef.T
+        self.intercept = intercept
+
+    def predict_proba(self, X):
+        prob = expit(np.asarray(X @ self.coef_T) + self.intercept).ravel()
+        return np.stack([1 - prob, prob], axis=1)
+
+
+class CompactModel:
+    """Drop-in for the joblib pipeline where score_candidates uses it
+    (``model['tfidf'].transform`` and ``model['clf'].predict_proba``)."""
+
+    def __init__(self, meta, vectorizer, classifier):
+        self.meta = meta
+        self.steps = {'tfidf': vectorizer, 'clf': classifier}
+
+    def __getitem__(self, name):
+        return self.steps[name]
+
+    @classmethod
+    def load(cls, path=COMPACT_DIR, mmap_mode='r'):
+        path = Path(path)
+        meta = json.loads((path / 'meta.json').read_text(encoding='utf-8'))
+
+        def arr(name):
+            return np.load(path / f'{name}.npy', mmap_mode=mmap_mode)
+
+        vocab = PackedTerms(arr('vocab_offsets'), arr('vocab_blob'))
+        vectorizer = CompactVectorizer(meta, vocab, arr('columns'), arr('idf'))
+        return cls(meta, vectorizer, CompactClassifier(meta, arr('coef'), arr('intercept')))
+
+
+def export_compact(model, out_dir=COMPACT_DIR, source_path=_SOURCE_MODEL):
+    tfidf, clf = model['tfidf'], model['clf']
+    params = tfidf.get_params()
+    unsupported = {k: params[k] for k in ('analyzer', 'stop_words', 'strip_accents', 'preprocessor', 'tokenizer', 'binary')
+                   if params[k] not in (None, False, 'word')}
+    if unsupported or len(clf.classes_) != 2:
+        raise SystemExit(f"Compact export supports the default binary word TF-IDF model only; got {unsupported or clf.classes_}")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    terms = sorted(tfidf.vocabulary_)
+    encoded = [t.encode('utf-8') for t in terms]
+    offsets = np.cumsum([0] + [len(b) for b in encoded], dtype=np.int64)
+    if offsets[-1] > np.iinfo(np.uint32).max:
+        raise SystemExit('Compact export: vocabulary exceeds 4 GiB')
+    np.save(out_dir / 'vocab_offsets.npy', offsets.astype(np.uint32))
+    np.save(out_dir / 'vocab_blob.npy', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    (out_dir / 'vocab.npy').unlink(missing_ok=True)
+    np.save(out_dir / 'columns.npy', np.array([tfidf.vocabulary_[t] for t in terms], dtype=np.int32))
+    np.save(out_dir / 'idf.npy', np.asarray(tfidf.idf_, dtype=np.float64))
+    np.save(out_dir / 'coef.npy', np.asarray(clf.coef_))
+    np.save(out_dir / 'intercept.npy', np.asarray(clf.intercept_))
+    meta = {
+        'lowercase': params['lowercase'],
+        'token_pattern': params['token_pattern'],
+        'ngram_range': list(params['ngram_range']),
+        'sublinear_tf': params['sublinear_tf'],
+        'norm': params['norm'],
+        'classes': np.asarray(clf.classes_).tolist(),
+        'source_sha256': file_digest(source_path),
+    }
+    (out_dir / 'meta.json').write_text(json.dumps(meta, indent=2), encoding='utf-8')
+    return out_dir
+
+
+def load_compact_checked(path=COMPACT_DIR, source_path=_SOURCE_MODEL):
+    """Load the export, refusing one made from a different .joblib than the current one."""
+    if not (Path(path) / 'meta.json').exists():
+        raise SystemExit(f"Compact model not found at {path}. Run: python ml/compact_model.py")
+    if not (Path(path) / 'vocab_offsets.npy').exists():
+        raise SystemExit(f"{path} uses the old vocab.npy layout. Re-run: python ml/compact_model.py")
+    model = CompactModel.load(path)
+    if Path(source_path).exists() and model.meta['source_sha256'] != file_digest(source_path):
+        raise SystemExit(f"{path} was exported from an older {source_path}. Re-run: python ml/compact_model.py")
+    return model
+
+
+def _cold_start_ms(code):
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the v1 model as memory-mappable arrays.')
+    parser.add_argument('--out', type=Path, default=COMPACT_DIR)
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Verify identical scores on pending and approved texts and report cold-start load time.')
+    args = parser.parse_args()
+
+    import joblib
+    model = joblib.load(_SOURCE_MODEL)
+    export_compact(model, args.out)
+    sizes = {p.name: p.stat().st_size for p in sorted(args.out.iterdir())}
+    size, source_size = sum(sizes.values()), _SOURCE_MODEL.stat().st_size
+    print(f"Wrote {args.out} ({size / 1024:.0f} KiB, {size / source_size:.2f}x "
+          f"{_SOURCE_MODEL} at {source_size / 1024:.0f} KiB)")
+    for name, n in sizes.items():
+        print(f"  {name:<18} {n / 1024:.0f} KiB")
+    if not args.benchmark:
+        return
+
+    from score_candidates import CANDIDATES_PATH, candidate_text, load_approved
+    from json_stream import iter_pending_items
+    compact = CompactModel.load(args.out)
+    texts = [candidate_text(c) for c in iter_pending_items(CANDIDATES_PATH)]
+    texts += [it['text'] for it in load_approved()]
+    a = model['tfidf'].transform(texts)
+    b = compact['tfidf'].transform(texts)
+    same_X = (a != b).nnz == 0
+    same_p = np.array_equal(model['clf'].predict_proba(a), compact['clf'].predict_proba(b))
+    print(f"Identical on {len(texts)} candidate and catalog texts: features={same_X} probabilities={same_p}")
+
+    ml_dir = str(Path(__file__).resolve().parent)
+    timer = 'import time; t=time.perf_counter(); {}; print((time.perf_counter()-t)*1000)'
+    joblib_ms = min(_cold_start_ms(timer.format(f"import joblib; joblib.load({str(_SOURCE_MODEL)!r})")) for _ in range(3))
+    compact_ms = min(_cold_start_ms(timer.format(
+        f"import sys; sys.path.insert(0, {ml_dir!r}); from compact_model import CompactModel; "
+        f"CompactModel.load({str(args.out)!r})")) for _ in range(3))
+    print(f"Cold start (import + load, best of 3): joblib {joblib_ms:.0f}ms -> compact {compact_ms:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
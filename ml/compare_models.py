@@ -0,0 +1,124 @@
+"""Compare the moderation model versions on the same labeled data: v1 (TF-IDF
+vocabulary), v2 (hashing + TF-IDF) and v3 (hashing + online SGD, one pass).
+
+All pipelines are fitted on the same stratified split of
+data/submissions_labeled.json and reported side by side:
+
+- ROC AUC on the held-out rows
+- peak Python heap during fit (tracemalloc) and fit time
+- saved model size (same compression ``train_moderation_model.py`` uses) and load time
+- scoring throughput: transform + predict_proba over the pending candidates,
+  ``BATCH_SIZE`` at a time, as ``score_candidates.py`` does
+
+Usage:
+  python ml/compare_models.py [--test-size 0.2] [--repeat N] [--out report.md]
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import joblib
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from json_stream import chunked, iter_pending_items
+from score_candidates import BATCH_SIZE, CANDIDATES_PATH, candidate_text
+from train_moderation_model import DATA_PATH, MODEL_PATHS, fit_model, load_labeled, save_model
+
+
+def n_features(pipe):
+    tfidf = pipe['tfidf']
+    if hasattr(tfidf, 'vocabulary_'):
+        return len(tfidf.vocabulary_)
+    if hasattr(tfidf, 'n_features'):
+        return tfidf.n_features
+    return tfidf['hash'].n_features
+
+
+def throughput(pipe, texts, rounds=3):
+    """Best-of-``rounds`` rows per second."""
+    best = float('inf')
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for chunk in chunked(texts, BATCH_SIZE):
+            pipe['clf'].predict_proba(pipe['tfidf'].transform(chunk))
+        best = min(best, time.perf_counter() - t0)
+    return len(texts) / best if best else float('inf')
+
+
+def evaluate(version, split, score_texts, tmp_dir):
+    X_train, X_test, y_train, y_test = split
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    pipe = fit_model(version, X_train, y_train)
+    fit_s = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    auc = roc_auc_score(y_test, pipe.predict_proba(X_test)[:, 1])
+    path = save_model(pipe, version, Path(tmp_dir) / MODEL_PATHS[version].name)
+    t0 = time.perf_counter()
+    joblib.load(path)
+    load_ms = (time.perf_counter() - t0) * 1000
+    return {
+        'version': version,
+        'auc': auc,
+        'features': n_features(pipe),
+        'fit_s': fit_s,
+        'peak_mib': peak / 2 ** 20,
+        'size_kib': path.stat().st_size / 1024,
+        'load_ms': load_ms,
+        'rows_s': throughput(pipe, score_texts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the moderation model versions on the same labeled data.')
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Tile the scoring texts N times for a steadier throughput figure.')
+    parser.add_argument('--out', help='Also write the markdown report to this path.')
+    args = parser.parse_args()
+
+    if not DATA_PATH.exists():
+        raise SystemExit(f"Missing labeled data at {DATA_PATH}.")
+    texts, labels = load_labeled(DATA_PATH)
+    if len(set(labels)) < 2:
+        raise SystemExit('Need both approved and rejected rows to compute AUC.')
+    split = train_test_split(texts, labels, test_size=args.test_size, stratify=labels, random_state=args.seed)
+
+    if CANDIDATES_PATH.exists():
+        score_texts = [candidate_text(c) for c in iter_pending_items(CANDIDATES_PATH)]
+        source = str(CANDIDATES_PATH)
+    else:
+        score_texts = split[1]
+        source = 'held-out rows'
+    score_texts *= max(1, args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = [evaluate(v, split, score_texts, tmp_dir) for v in sorted(MODEL_PATHS)]
+
+    lines = [
+        '# Moderation model comparison',
+        '',
+        f'Labeled rows: {len(texts)} (train {len(split[0])}, held out {len(split[1])}); '
+        f'scoring {len(score_texts)} texts from {source}',
+        '',
+        'Model | Features | Holdout AUC | Fit s | Fit peak MiB | Model KiB | Load ms | Score rows/s',
+        '----- | -------- | ----------- | ----- | ------------ | --------- | ------- | ------------',
+    ]
+    for r in results:
+        lines.append(f"{r['version']} | {r['features']} | {r['auc']:.4f} | {r['fit_s']:.2f} | "
+                     f"{r['peak_mib']:.1f} | {r['size_kib']:.0f} | {r['load_ms']:.0f} | {r['rows_s']:.0f}")
+
+    report = '\n'.join(lines) + '\n'
+    print(report)
+    if args.out:
+        Path(args.out).write_text(report, encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""Lookup index of tools we already know, consulted before scoring candidates.
+
+Every tool in the live catalog, the non-product archive and the catalog
+backups is entered under up to three keys:
+
+- ``link:<host><path>[?<query>]``  lower-cased, ``www.`` dropped, no fragment or
+  trailing slash; query parameters are kept (sorted, tracking ones dropped) since
+  they name the tool on marketplace links (``items?itemName=``, ``details?id=``).
+  Bare homepages (empty path) get no link key: a vendor's tools share them.
+- ``name:<name>``        lower-cased alphanumerics, after ``data/aliases.json``
+- ``repo:<owner>/<repo>`` for github.com links
+
+A candidate matching any key is a known tool, reported with the status of the
+best source it was found in: ``catalog`` (public/tools.json), then
+``archived`` (public/non_product_archive.json), then ``removed`` (present only
+in a tools.json backup, i.e. pruned from the catalog). Lookups are dict hits,
+O(1) per candidate.
+
+The index is saved as JSON in ml/cache, keyed by a hash of every source file,
+so it is only rebuilt when one of them changes.
+"""
+import hashlib
+import json
+import os
+import re
+from glob import glob
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from approved_index import INDEX_DIR, file_digest
+from json_stream import iter_section_tools
+
+DEDUP_PREFIX = 'dedup-'
+# Part of the cache key: bump when tool_keys() changes so old indexes are rebuilt.
+KEY_VERSION = 2
+ALIASES_PATH = Path('data/aliases.json')
+# Earlier sources win when a key appears in several.
+SOURCES = [
+    (Path('public/tools.json'), 'catalog'),
+    (Path('public/non_product_archive.json'), 'archived'),
+    *[(Path(p), 'removed') for p in sorted(glob('public/tools.*backup*.json'))],
+]
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+# Query parameters that never identify a tool.
+_TRACKING_PARAMS = re.compile(r'utm_.*|ref|ref_src|source|fbclid|gclid|hl|lang')
+
+
+def load_aliases(path: Path = ALIASES_PATH):
+    if not path.exists():
+        return {}
+    aliases = json.loads(path.read_text(encoding='utf-8')).get('aliases', {})
+    return {name_key(k): name_key(v) for k, v in aliases.items()}
+
+
+def name_key(name) -> str:
+    return _NON_ALNUM.sub('', str(name or '').strip().lower())
+
+
+def _split_link(link):
+    """(host, path, query) lower-cased, or None for anything without a host."""
+    try:
+        parts = urlsplit(str(link or '').strip())
+        host = (parts.hostname or '').lower()
+    except ValueError:
+        return None
+    if not host:
+        return None
+    host = host[4:] if host.startswith('www.') else host
+    query = sorted((k.lower(), v.lower()) for k, v in parse_qsl(parts.query)
+                   if not _TRACKING_PARAMS.fullmatch(k.lower()))
+    return host, parts.path.rstrip('/').lower(), urlencode(query)
+
+
+def link_key(link) -> str | None:
+    """Host, path and identifying query of a link; None for a bare homepage.
+
+    >>> link_key('https://marketplace.visualstudio.com/items?itemName=saoudrizwan.claude-dev')
+    'marketplace.visualstudio.com/items?itemname=saoudrizwan.claude-dev'
+    >>> link_key('https://marketplace.visualstudio.com/items?itemName=kilocode.Kilo-Code&utm_source=x')
+    'marketplace.visualstudio.com/items?itemname=kilocode.kilo-code'
+    >>> link_key('https://www.Example.com/'), link_key('https://example.com/app/#top')
+    (None, 'example.com/app')
+    """
+    parts = _split_link(link)
+    if parts is None or not (parts[1] or parts[2]):
+        return None
+    host, path, query = parts
+    return host + (path or '/') + (f'?{query}' if query else '')
+
+
+def github_repo(link) -> str | None:
+    parts = _split_link(link)
+    if parts is None or parts[0] != 'github.com':
+        return None
+    segs = [s for s in parts[1].split('/') if s]
+    if len(segs) < 2:
+        return None
+    repo = segs[1][:-4] if segs[1].endswith('.git') else segs[1]
+    return f'{segs[0]}/{repo}'
+
+
+def tool_keys(tool, aliases=None):
+    """Index keys of a tool or candidate, most specific first."""
+    keys = []
+    repo = github_repo(tool.get('link'))
+    if repo:
+        keys.append(f'repo:{repo}')
+    link = link_key(tool.get('link'))
+    if link:
+        keys.append(f'link:{link}')
+    name = name_key(tool.get('name'))
+    if name:
+        keys.append(f'name:{(aliases or {}).get(name, name)}')
+    return keys
+
+
+def index_key(sources=SOURCES, aliases_path: Path = ALIASES_PATH) -> str:
+    h = hashlib.sha256(f'v{KEY_VERSION}\0'.encode())
+    for path, status in sources:
+        if path.exists():
+            h.update(f'{path}\0{status}\0{file_digest(path)}\0'.encode())
+    if aliases_path.exists():
+        h.update(file_digest(aliases_path).encode())
+    return h.hexdigest()[:16]
+
+
+class DedupIndex:
+    def __init__(self, key: str, entries, aliases):
+        self.key = key
+        self.entries = entries
+        self.aliases = aliases
+        self.matched = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def build(cls, key: str, sources=SOURCES, aliases_path: Path = ALIASES_PATH):
+        aliases = load_aliases(aliases_path)
+        entries = {}
+        for path, status in sources:
+            if not path.exists():
+                continue
+            for section, t in iter_section_tools(path):
+                for k in tool_keys(t, aliases):
+                    entries.setdefault(k, {'status': status, 'name': t.get('name'),
+                                           'domainSlug': section, 'source': str(path)})
+        return cls(key, entries, aliases)
+
+    def match(self, candidate):
+        """The known tool a candidate duplicates (with the key kind that matched), or None."""
+        for k in tool_keys(candidate, self.aliases):
+            entry = self.entries.get(k)
+            if entry is not None:
+                self.matched[entry['status']] = self.matched.get(entry['status'], 0) + 1
+                return {**entry, 'match': k.split(':', 1)[0]}
+        return None
+
+
+def _path(key: str, index_dir: Path) -> Path:
+    return index_dir / f'{DEDUP_PREFIX}{key}.json'
+
+
+def load_or_build(sources=SOURCES, aliases_path: Path = ALIASES_PATH, index_dir: Path = INDEX_DIR,
+                  rebuild: bool = False):
+    """Return ``(index, built)``; an index saved for the same source files is reused."""
+    key = index_key(sources, aliases_path)
+    path = _path(key, index_dir)
+    if not rebuild and path.exists():
+        data = json.loads(path.read_text(encoding='utf-8'))
+        return DedupIndex(key, data['entries'], data['aliases']), False
+    index = DedupIndex.build(key, sources, aliases_path)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps({'entries': index.entries, 'aliases': index.aliases},
+                              separators=(',', ':')), encoding='utf-8')
+    os.replace(tmp, path)
+    for stale in index_dir.glob(f'{DEDUP_PREFIX}*.json'):
+        if stale != path:
+            stale.unlink()
+    return index, True
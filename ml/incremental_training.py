@@ -0,0 +1,139 @@
+"""Out-of-core training for the online v3 moderation model.
+
+v3 is a stateless ``HashingVectorizer`` in front of an ``SGDClassifier`` with
+log loss, so it can learn from ``submissions_labeled.json`` one mini-batch at a
+time with ``partial_fit`` and never needs the whole file in memory.
+
+Next to the model a small JSON checkpoint records how many rows of the labeled
+array have been consumed, a sha256 over those rows, the running class counts
+and the sha256 of the model file it belongs to. A resumed run re-hashes that
+prefix (no vectorizing or fitting) and trains only on the rows after it, so the
+weekly retrain costs time proportional to the newly labeled rows. If earlier
+rows were edited or removed, or the model file does not match the checkpoint,
+the model is retrained from scratch instead.
+"""
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from itertools import islice
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from approved_index import file_digest
+from json_stream import chunked, iter_json_array
+
+CHECKPOINT_PATH = Path('ml/model_v3.checkpoint.json')
+# Labeled rows per partial_fit call.
+TRAIN_BATCH_SIZE = 1000
+CLASSES = np.array([0, 1])
+LABELS = {'rejected': 0, 'approved': 1}
+
+
+@dataclass
+class Checkpoint:
+    rows: int = 0
+    prefix_sha256: str = hashlib.sha256().hexdigest()
+    class_counts: list = field(default_factory=lambda: [0, 0])
+    model_sha256: str = ''
+
+    @classmethod
+    def load(cls, path: Path):
+        try:
+            return cls(**json.loads(Path(path).read_text(encoding='utf-8')))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(json.dumps(asdict(self), indent=2), encoding='utf-8')
+        os.replace(tmp, path)
+
+
+def _hash_row(h, row):
+    h.update(json.dumps(row, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    h.update(b'\n')
+
+
+def partial_fit_batch(pipe, texts, labels, class_counts):
+    """One SGD step over a mini-batch. ``class_weight='balanced'`` is not
+    available to ``partial_fit``, so the same weights are derived from the
+    running class counts (updated in place)."""
+    y = np.asarray(labels)
+    for c in CLASSES:
+        class_counts[c] += int((y == c).sum())
+    total = sum(class_counts)
+    weights = np.array([total / (len(CLASSES) * n) if n else 1.0 for n in class_counts])
+    pipe['clf'].partial_fit(pipe['tfidf'].transform(texts), y, classes=CLASSES, sample_weight=weights[y])
+
+
+def fit_online(pipe, texts, labels, batch_size=TRAIN_BATCH_SIZE):
+    """Single pass of ``partial_fit`` over in-memory data (used by compare_models)."""
+    class_counts = [0, 0]
+    for start in range(0, len(texts), batch_size):
+        partial_fit_batch(pipe, texts[start:start + batch_size], labels[start:start + batch_size], class_counts)
+    return pipe
+
+
+def _resume(data_path, model_path, checkpoint):
+    """Return ``(pipe, rows, digest)`` positioned after the checkpointed
+    prefix, or None when the checkpoint cannot be trusted."""
+    if not Path(model_path).exists() or file_digest(model_path) != checkpoint.model_sha256:
+        print(f"{model_path} does not match its checkpoint; retraining from scratch")
+        return None
+    rows = iter_json_array(data_path)
+    h = hashlib.sha256()
+    seen = 0
+    for row in islice(rows, checkpoint.rows):
+        _hash_row(h, row)
+        seen += 1
+    if seen != checkpoint.rows or h.hexdigest() != checkpoint.prefix_sha256:
+        print(f"The first {checkpoint.rows} rows of {data_path} changed since the checkpoint; retraining from scratch")
+        return None
+    return joblib.load(model_path), rows, h
+
+
+def train_incremental(new_pipeline, row_text, data_path, model_path, checkpoint_path=CHECKPOINT_PATH,
+                      batch_size=TRAIN_BATCH_SIZE, reset=False, compress=3):
+    """Train ``model_path`` on the rows of ``data_path`` not yet covered by the
+    checkpoint. Returns ``(checkpoint, new_labeled_rows, resumed)``."""
+    checkpoint = None if reset else Checkpoint.load(checkpoint_path)
+    state = _resume(data_path, model_path, checkpoint) if checkpoint else None
+    resumed = state is not None
+    if resumed:
+        pipe, rows, h = state
+    else:
+        checkpoint = Checkpoint()
+        pipe, rows, h = new_pipeline(), iter_json_array(data_path), hashlib.sha256()
+
+    learned = 0
+    for chunk in chunked(rows, batch_size):
+        texts, labels = [], []
+        for r in chunk:
+            _hash_row(h, r)
+            label = LABELS.get(r.get('status'))
+            if label is not None:
+                texts.append(row_text(r))
+                labels.append(label)
+        if texts:
+            partial_fit_batch(pipe, texts, labels, checkpoint.class_counts)
+            learned += len(texts)
+        checkpoint.rows += len(chunk)
+    checkpoint.prefix_sha256 = h.hexdigest()
+
+    if learned or not resumed:
+        if not learned:
+            raise SystemExit('No labeled rows with status approved/rejected found.')
+        model_path = Path(model_path)
+        model_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = model_path.with_name(model_path.name + '.tmp')
+        joblib.dump(pipe, tmp, compress=compress)
+        os.replace(tmp, model_path)
+        checkpoint.model_sha256 = file_digest(model_path)
+    # Saved even without new labels: unlabeled rows appended since the last
+    # run are still consumed, and the prefix digest moves with them.
+    checkpoint.save(checkpoint_path)
+    return checkpoint, learned, resumed
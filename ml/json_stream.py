@@ -0,0 +1,149 @@
+"""Incremental readers for the JSON files the ML scripts consume.
+
+Only one array element is decoded at a time, so memory is bounded by the
+largest element (a tool, or one domain of tools.json) rather than the file:
+
+- ``iter_json_array``    top-level ``[...]`` (e.g. submissions_labeled.json)
+- ``iter_pending_items`` ``{..., "items": [...]}`` (pending-tools.json) or a bare array
+- ``iter_catalog_tools`` ``[{slug, tools: [...]}]`` (tools.json and its backups)
+- ``iter_section_tools`` either of those or non_product_archive.json's ``items``
+
+No third-party streaming parser is needed: values are cut out of a sliding
+text buffer with ``json.JSONDecoder.raw_decode``.
+"""
+import json
+from itertools import islice
+
+READ_SIZE = 1 << 16
+_WS = ' \t\n\r'
+_NUMBER_TAIL = '0123456789.eE+-'
+
+
+class _Scanner:
+    def __init__(self, f, read_size=READ_SIZE):
+        self.f = f
+        self.read_size = read_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        # Read at least as much as is pending so retrying a large value after
+        # a partial decode stays linear overall.
+        chunk = self.f.read(max(self.read_size, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop the consumed prefix so the buffer only ever holds the value
+        # being decoded plus one read of lookahead.
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"Expected one of {chars!r} in JSON stream, got {ch!r}")
+        self.pos += 1
+        return ch
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number cut at the buffer edge ("12" of "123", "2" of "2.5")
+            # decodes fine but short; make sure the next character ends it.
+            cut = end == len(self.buf) or (
+                isinstance(obj, (int, float)) and self.buf[end] in _NUMBER_TAIL)
+            if cut and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+    def array(self):
+        """Yield the elements of the array starting at the cursor."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+    def object_items(self):
+        """Yield ``(key, scanner)``; the consumer must read the value before
+        advancing, either with ``value()``/``array()`` or by skipping it."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key, self
+            if self.expect(',}') == '}':
+                return
+
+
+def iter_json_array(path):
+    with open(path, encoding='utf-8') as f:
+        yield from _Scanner(f).array()
+
+
+def iter_pending_items(path):
+    """Candidates from ``{"items": [...]}`` or from a bare top-level array."""
+    with open(path, encoding='utf-8') as f:
+        scanner = _Scanner(f)
+        if scanner.peek() == '[':
+            yield from scanner.array()
+            return
+        for key, sc in scanner.object_items():
+            if key == 'items':
+                yield from sc.array()
+            else:
+                sc.value()
+
+
+def iter_catalog_tools(path):
+    """``(domain_slug, tool)`` pairs, one domain decoded at a time."""
+    for domain in iter_json_array(path):
+        slug = domain.get('slug')
+        for tool in domain.get('tools', []):
+            yield slug, tool
+
+
+def iter_section_tools(path):
+    """``(section, tool)`` pairs from tools.json-shaped files or the non-product archive."""
+    for entry in iter_pending_items(path):
+        # tools.json domains carry a 'tools' list; archive items wrap one 'tool'.
+        if 'tools' in entry:
+            for t in entry['tools']:
+                yield entry.get('slug'), t
+        else:
+            yield entry.get('originalCategorySlug'), entry.get('tool') or entry
+
+
+def chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
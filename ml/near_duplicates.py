@@ -0,0 +1,183 @@
+"""Near-duplicate tools across the catalog, its backups and the archive.
+
+The hygiene report only matches exact names. Here every tool's ``to_text()``
+(name, description, tags) is cut into character shingles and summarised by a
+MinHash signature; signatures are split into LSH bands and only tools sharing
+a band bucket are compared, so the work grows with the number of tools plus
+the number of likely matches instead of all pairs. Candidate pairs are then
+scored by the exact Jaccard similarity of their shingle sets, and pairs at or
+above ``--threshold`` are joined into clusters.
+
+Identical records (same section, name, link and text) found in several files
+are folded into one entry listing every file, so a backup does not report the
+live catalog as its own duplicate.
+
+With NUM_PERM = BANDS * ROWS = 32 * 4, a pair becomes a candidate with
+probability 1 - (1 - s^4)^32: ~0.87 at s = 0.5, ~0.99 at s = 0.6.
+
+Usage:
+  python ml/near_duplicates.py [--threshold 0.5] [--out data/near-duplicates.json]
+  python ml/near_duplicates.py --archives          # + tools.*backup*.json and the non-product archive
+"""
+import argparse
+import json
+import re
+import time
+import zlib
+from datetime import datetime, timezone
+from glob import glob
+from pathlib import Path
+
+import numpy as np
+
+from json_stream import iter_section_tools
+from score_candidates import APPROVED_PATH, to_text
+
+ARCHIVE_CATALOGS = [*sorted(glob('public/tools.*backup*.json')), 'public/non_product_archive.json']
+OUTPUT_PATH = Path('data/near-duplicates.json')
+
+SHINGLE = 5
+BANDS = 32
+ROWS = 4
+NUM_PERM = BANDS * ROWS
+THRESHOLD = 0.5
+# Mersenne prime 2^31 - 1: a * x + b stays below 2^63 for 31-bit a, x and b.
+_PRIME = (1 << 31) - 1
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def load_documents(paths):
+    """One document per distinct (section, name, link, text), with the files it appears in."""
+    docs = {}
+    for path in paths:
+        for section, t in iter_section_tools(path):
+            text = to_text(t.get('name'), t.get('description'), t.get('tags'))
+            key = (section, t.get('name'), t.get('link'), text)
+            doc = docs.get(key)
+            if doc is None:
+                docs[key] = doc = {'name': t.get('name'), 'domainSlug': section, 'link': t.get('link'),
+                                   'text': text, 'sources': []}
+            if str(path) not in doc['sources']:
+                doc['sources'].append(str(path))
+    return list(docs.values())
+
+
+def shingles(text, k=SHINGLE):
+    """31-bit hashes of the character k-grams of the case- and punctuation-folded text."""
+    text = _NON_WORD.sub(' ', text.lower()).strip()
+    if len(text) <= k:
+        return {zlib.crc32(text.encode()) % _PRIME}
+    return {zlib.crc32(text[i:i + k].encode()) % _PRIME for i in range(len(text) - k + 1)}
+
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, seed=0):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)[:, None]
+        self.b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, hashes):
+        x = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))[None, :]
+        return ((self.a * x + self.b) % _PRIME).min(axis=1)
+
+
+def candidate_pairs(signatures, bands=BANDS, rows=ROWS):
+    """Index pairs sharing at least one LSH band bucket."""
+    pairs = set()
+    for band in range(bands):
+        buckets = {}
+        for i, sig in enumerate(signatures):
+            buckets.setdefault(sig[band * rows:(band + 1) * rows].tobytes(), []).append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((members[x], members[y]))
+    return pairs
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def cluster(n, scored_pairs):
+    """Connected components (size >= 2) of the scored pairs, via union-find."""
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j, _ in scored_pairs:
+        parent[find(i)] = find(j)
+    groups = {}
+    for i, j, score in scored_pairs:
+        groups.setdefault(find(i), []).append((i, j, score))
+    return list(groups.values())
+
+
+def find_near_duplicates(docs, threshold=THRESHOLD, bands=BANDS, rows=ROWS, seed=0):
+    """(clusters, number of LSH candidate pairs); clusters are ordered by best similarity."""
+    sets = [shingles(d['text']) for d in docs]
+    hasher = MinHasher(bands * rows, seed)
+    signatures = [hasher.signature(s) for s in sets]
+    candidates = candidate_pairs(signatures, bands, rows)
+    scored = []
+    for i, j in sorted(candidates):
+        score = jaccard(sets[i], sets[j])
+        if score >= threshold:
+            scored.append((i, j, score))
+    clusters = []
+    for group in cluster(len(docs), scored):
+        members = sorted({i for i, j, _ in group} | {j for _, j, _ in group})
+        clusters.append({
+            'size': len(members),
+            'maxSimilarity': round(max(s for _, _, s in group), 3),
+            'members': [{k: docs[i][k] for k in ('name', 'domainSlug', 'link', 'sources')} for i in members],
+            'pairs': [{'a': members.index(i), 'b': members.index(j), 'similarity': round(s, 3)}
+                      for i, j, s in sorted(group, key=lambda p: -p[2])],
+        })
+    clusters.sort(key=lambda c: (-c['maxSimilarity'], -c['size'], c['members'][0]['name'] or ''))
+    return clusters, len(candidates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find near-duplicate tools with MinHash/LSH.')
+    parser.add_argument('--catalog', nargs='+', default=[str(APPROVED_PATH)],
+                        help=f'tools.json-shaped or archive files to scan (default {APPROVED_PATH}).')
+    parser.add_argument('--archives', action='store_true',
+                        help='Also scan the tools.json backups and public/non_product_archive.json.')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help=f'Minimum shingle Jaccard similarity to report (default {THRESHOLD}).')
+    parser.add_argument('--bands', type=int, default=BANDS, help=f'LSH bands (default {BANDS}).')
+    parser.add_argument('--rows', type=int, default=ROWS, help=f'Signature rows per band (default {ROWS}).')
+    parser.add_argument('--out', type=Path, default=OUTPUT_PATH, help=f'Report path (default {OUTPUT_PATH}).')
+    args = parser.parse_args()
+
+    paths = args.catalog + (ARCHIVE_CATALOGS if args.archives else [])
+    t0 = time.perf_counter()
+    docs = load_documents(paths)
+    clusters, n_candidates = find_near_duplicates(docs, args.threshold, args.bands, args.rows)
+    elapsed = time.perf_counter() - t0
+    n_pairs = len(docs) * (len(docs) - 1) // 2
+    report = {
+        'generatedAt': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'catalogs': paths,
+        'params': {'shingle': SHINGLE, 'bands': args.bands, 'rows': args.rows, 'threshold': args.threshold},
+        'summary': {'tools': len(docs), 'candidatePairs': n_candidates, 'allPairs': n_pairs,
+                    'clusters': len(clusters), 'seconds': round(elapsed, 2)},
+        'clusters': clusters,
+    }
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(report, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+    print(f"{len(docs)} tools, {n_candidates} candidate pairs of {n_pairs} "
+          f"({n_candidates / max(1, n_pairs):.2%}), {len(clusters)} clusters in {elapsed:.2f}s")
+    for c in clusters[:10]:
+        names = ', '.join(f"{m['name']} ({m['domainSlug']})" for m in c['members'][:4])
+        print(f"  {c['maxSimilarity']:.2f}  {names}{' ...' if c['size'] > 4 else ''}")
+    print(f"Wrote {args.out}")
+
+
+if __name__ == '__main__':
+    main()
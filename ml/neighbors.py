@@ -0,0 +1,101 @@
+"""Neighbour-search backends behind mlSimilar.
+
+Every backend is built over the L2-normalised TF-IDF rows of a catalog and
+answers ``query(X, k)`` with one ``(indices, scores)`` pair per row of ``X``,
+best match first.
+
+- ``exact``: brute-force cosine over the whole sparse matrix.
+- ``svd``: truncated SVD of the catalog into a small dense space, a BLAS scan
+  with partial sort to pick ``n_candidates`` rows per query, then an exact
+  sparse re-rank of those rows. Approximate in recall (see bench_neighbors.py).
+
+Sign random-projection LSH was tried first; top cosines between tools are
+only ~0.1-0.2, so true neighbours almost never share a bucket and recall stayed
+near 0.3. A ball/VP tree over the reduced space degenerates to a linear scan at
+100+ dimensions, so the dense scan is done directly.
+"""
+import joblib
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+TOP_K = 3
+
+
+def top_k_indices(sims, k=TOP_K):
+    """Indices of the k highest scores in each row of a dense block, best first.
+
+    Matches the old per-row ``row.argsort()[-k:][::-1]`` up to ties: that
+    default argsort is not stable, so its tie order was unspecified, while
+    here it is deterministic (ties go to the later catalog entry, as with
+    ``kind='stable'``). Each row is only partitioned, not sorted.
+    """
+    n = sims.shape[1]
+    k = min(k, n)
+    if k == 0:
+        return [np.empty(0, dtype=np.intp) for _ in range(sims.shape[0])]
+    kth = np.partition(sims, n - k, axis=1)[:, n - k]
+    out = []
+    for row, thresh in zip(sims, kth):
+        above = np.flatnonzero(row > thresh)
+        ties = np.flatnonzero(row == thresh)[::-1][:k - len(above)]
+        idxs = np.concatenate([above, ties])
+        order = np.lexsort((-idxs, -row[idxs]))
+        out.append(idxs[order])
+    return out
+
+
+class ExactSearch:
+    name = 'exact'
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def query(self, X, k=TOP_K):
+        sims = cosine_similarity(X, self.vectors)
+        return [(idxs, row[idxs]) for row, idxs in zip(sims, top_k_indices(sims, k))]
+
+
+class ReducedDenseSearch:
+    name = 'svd'
+
+    def __init__(self, vectors, n_components=128, n_candidates=128, cache_path=None, seed=0):
+        self.vectors = normalize(vectors).tocsr()
+        self.n_candidates = n_candidates
+        n_components = max(1, min(n_components, min(vectors.shape) - 1))
+        cached = joblib.load(cache_path) if cache_path and cache_path.exists() else None
+        if cached and cached['svd'].n_components == n_components:
+            self.svd, self.embedding = cached['svd'], cached['embedding']
+        else:
+            self.svd = TruncatedSVD(n_components=n_components, random_state=seed)
+            self.embedding = normalize(self.svd.fit_transform(self.vectors)).astype(np.float32)
+            if cache_path:
+                joblib.dump({'svd': self.svd, 'embedding': self.embedding}, cache_path)
+
+    def query(self, X, k=TOP_K):
+        Xn = normalize(X).tocsr()
+        n = self.vectors.shape[0]
+        c = min(max(k, self.n_candidates), n)
+        dense = normalize(self.svd.transform(Xn)).astype(np.float32) @ self.embedding.T
+        # Ascending candidate order keeps the exact backend's tie-break.
+        cands = np.sort(np.argpartition(dense, n - c, axis=1)[:, n - c:], axis=1)
+        rows = np.repeat(np.arange(Xn.shape[0]), c)
+        exact = np.asarray(Xn[rows].multiply(self.vectors[cands.ravel()]).sum(axis=1))
+        exact = exact.reshape(Xn.shape[0], c)
+        return [(cand[sel], row[sel])
+                for cand, row, sel in zip(cands, exact, top_k_indices(exact, k))]
+
+
+BACKENDS = {
+    ExactSearch.name: ExactSearch,
+    ReducedDenseSearch.name: ReducedDenseSearch,
+}
+
+
+def make_search(name, vectors, **params):
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise SystemExit(f"Unknown neighbour backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    return backend(vectors, **params)
@@ -0,0 +1,55 @@
+"""Result cache for incremental scoring (``score_candidates.py --incremental``).
+
+Each candidate is keyed by a hash of its ``to_text()`` input salted with the
+model version, the approved-index key (catalog + model file) and the
+neighbour backend, so any change to the candidate, the model or the catalog
+is a miss. Entries not seen during a run are dropped on save, which keeps the
+file the size of the current pending list.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+CACHE_PATH = Path('ml/cache/score-cache.json')
+
+
+class ScoreCache:
+    def __init__(self, path: Path, salt: str):
+        self.path = Path(path)
+        self.salt = salt
+        self.entries = {}
+        self.seen = {}
+        self.hits = 0
+        self.misses = 0
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding='utf-8'))
+            except ValueError:
+                self.entries = {}
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f'{self.salt}\0{text}'.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.seen[key] = entry
+        return entry
+
+    def put(self, key: str, entry) -> None:
+        self.seen[key] = entry
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(json.dumps(self.seen, separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp, self.path)
@@ -1,12 +1,35 @@
-import json
+import argparse
+import time
 import joblib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from sklearn.metrics.pairwise import cosine_similarity
 
-MODEL_PATH = Path('ml/model_v1.joblib')
+import catalog_columns
+import dedup_index
+from approved_index import INDEX_DIR, INDEX_PREFIX, load_index, load_or_build
+from compact_model import COMPACT_DIR, load_compact_checked
+from json_stream import chunked, iter_pending_items
+from neighbors import BACKENDS, TOP_K, make_search
+from score_cache import CACHE_PATH, ScoreCache
+from scored_output import FORMATS, open_writer
+
+MODEL_PATHS = {
+    'v1': Path('ml/model_v1.joblib'),
+    'v2': Path('ml/model_v2.joblib'),
+    'v3': Path('ml/model_v3.joblib'),
+}
+MODEL_VERSION = 'v1'
+MODEL_PATH = MODEL_PATHS[MODEL_VERSION]
 APPROVED_PATH = Path('public/tools.json')
 CANDIDATES_PATH = Path('data/pending-tools.json')
 OUTPUT_PATH = Path('data/pending-tools.scored.json')
+NDJSON_OUTPUT_PATH = Path('data/pending-tools.scored.ndjson')
+
+APPROVE_THRESHOLD = 0.6
+# Candidates read, vectorized and scored together; bounds both the candidate
+# working set and the dense similarity block (BATCH_SIZE * len(approved)).
+BATCH_SIZE = 512
 
 
 def to_text(name, description, tags):
@@ -20,57 +43,257 @@ def to_text(name, description, tags):
 
 
 def load_approved():
-    approved = json.loads(APPROVED_PATH.read_text(encoding='utf-8'))
-    items = []
-    for domain in approved:
-        slug = domain.get('slug')
-        for t in domain.get('tools', []):
-            items.append({
-                'name': t.get('name'),
-                'domainSlug': slug,
-                'text': to_text(t.get('name'), t.get('description'), t.get('tags'))
-            })
-    return items
+    # Reads name/description/tags from the columnar build (rebuilt when
+    # tools.json changes) instead of parsing about/pros/cons as well.
+    catalog, _ = catalog_columns.load_or_build(catalog_columns.COLUMNS_PATH, APPROVED_PATH)
+    try:
+        return [{
+            'name': t['name'],
+            'domainSlug': t['domainSlug'],
+            'text': to_text(t['name'], t['description'], t['tags'])
+        } for t in catalog.project(('name', 'domainSlug', 'description', 'tags'))]
+    finally:
+        catalog.close()
+
+
+def candidate_text(c):
+    return to_text(c.get('name'), c.get('description'), c.get('tags'))
+
+
+def annotate(c, proba, similar, version=MODEL_VERSION):
+    c = dict(c)
+    c['mlScore'] = proba
+    c['mlDecision'] = 'approve' if proba >= APPROVE_THRESHOLD else 'reject'
+    c['mlVersion'] = version
+    c['mlSimilar'] = similar
+    return c
+
+
+def annotate_known(c, known, version=MODEL_VERSION):
+    """A candidate that duplicates a catalog, archived or removed tool; no model score."""
+    c = dict(c)
+    c['mlScore'] = None
+    c['mlDecision'] = 'known'
+    c['mlVersion'] = version
+    c['mlSimilar'] = [{'name': known['name'], 'domainSlug': known['domainSlug'], 'score': 1.0}]
+    c['mlKnown'] = known
+    return c
+
+
+def screen_known(score, candidates, index, skip=False, version=MODEL_VERSION):
+    """Look every candidate up in the dedup index before ``score`` (a callable
+    mapping an iterable of candidates to scored records) sees it. Known tools
+    are tagged, or dropped with ``skip``, in input order; only the rest are
+    scored."""
+    order = deque()  # None marks a candidate handed to ``score``
+
+    def unknown():
+        for c in candidates:
+            known = index.match(c)
+            if known is None:
+                order.append(None)
+                yield c
+            elif not skip:
+                order.append(annotate_known(c, known, version))
+
+    for record in score(unknown()):
+        while order[0] is not None:
+            yield order.popleft()
+        order.popleft()
+        yield record
+    yield from order
+
+
+def score_batch(model, candidates, index, search, batch_size=BATCH_SIZE, version=MODEL_VERSION):
+    """Yield scored candidates, pulling ``batch_size`` at a time from any
+    iterable: one transform, one predict_proba and one neighbour query (a
+    candidate x approved product for ``exact``) per chunk."""
+    vectorizer = model['tfidf']
+    clf = model['clf']
+    for chunk in chunked(candidates, batch_size):
+        X = vectorizer.transform([candidate_text(c) for c in chunk])
+        probas = clf.predict_proba(X)[:, 1]
+        for c, proba, (idxs, scores) in zip(chunk, probas, search.query(X, TOP_K)):
+            yield annotate(c, float(proba), [{
+                'name': str(index.names[i]),
+                'domainSlug': str(index.domain_slugs[i]),
+                'score': float(score)
+            } for i, score in zip(idxs, scores)], version)
+
+
+def score_incremental(score, candidates, cache, batch_size=BATCH_SIZE, version=MODEL_VERSION):
+    """Reuse cached results and send only the misses of each chunk to ``score``
+    (a callable mapping a list of candidates to their scored records)."""
+    for chunk in chunked(candidates, batch_size):
+        keys = [cache.key(candidate_text(c)) for c in chunk]
+        hits = [cache.get(k) for k in keys]
+        misses = [c for c, hit in zip(chunk, hits) if hit is None]
+        fresh = iter(score(misses)) if misses else iter(())
+        for c, key, hit in zip(chunk, keys, hits):
+            if hit is None:
+                scored = next(fresh)
+                cache.put(key, {'mlScore': scored['mlScore'], 'mlSimilar': scored['mlSimilar']})
+                yield scored
+            else:
+                yield annotate(c, hit['mlScore'], hit['mlSimilar'], version)
+
+
+# Per-process state for --workers; set once by _init_worker.
+_worker = {}
+
+
+def load_model(compact=False, version=MODEL_VERSION):
+    if compact:
+        return load_compact_checked(COMPACT_DIR, MODEL_PATHS[version])
+    return joblib.load(MODEL_PATHS[version])
+
+
+def _init_worker(index_key, neighbors, params, compact, version):
+    # Memory-map the model's numpy arrays instead of copying them per process
+    # (v2 and v3 are saved compressed, which joblib cannot map).
+    path = MODEL_PATHS[version]
+    if compact:
+        model = load_compact_checked(COMPACT_DIR, path)
+    else:
+        model = joblib.load(path, mmap_mode='r' if version == 'v1' else None)
+    index = load_index(index_key)
+    _worker.update(model=model, index=index, search=make_search(neighbors, index.vectors, **params),
+                   version=version)
+
+
+def _score_shard(shard):
+    return list(score_batch(_worker['model'], shard, _worker['index'], _worker['search'], len(shard),
+                            _worker['version']))
+
+
+def score_parallel(pool, candidates, shard_size, workers):
+    """Score shards on ``pool`` and yield records in input order.
+
+    At most ``2 * workers`` shards are in flight, so the candidate stream is
+    still read lazily. Every row is scored independently of its shard, so the
+    output matches a serial run byte for byte.
+    """
+    pending = deque()
+    for shard in chunked(candidates, shard_size):
+        pending.append(pool.submit(_score_shard, shard))
+        if len(pending) >= 2 * workers:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Score pending tools and suggest similar approved items.')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help=f'Candidates per vectorized scoring chunk (default {BATCH_SIZE}).')
+    parser.add_argument('--neighbors', choices=sorted(BACKENDS), default='exact',
+                        help="mlSimilar search backend: brute-force 'exact' or approximate 'svd' (default exact).")
+    parser.add_argument('--format', choices=FORMATS, default='json',
+                        help="'json' array for the admin UI (default) or 'ndjson', written record by record.")
+    parser.add_argument('--gzip', action='store_true', help='Gzip the output (adds .gz).')
+    parser.add_argument('--output', type=Path, help='Output path (default depends on --format).')
+    parser.add_argument('--model-version', choices=sorted(MODEL_PATHS), default=MODEL_VERSION,
+                        help=f"Model to score with: 'v1' TF-IDF, 'v2' hashing vectorizer or 'v3' online SGD (default {MODEL_VERSION}).")
+    parser.add_argument('--compact', action='store_true',
+                        help=f'Load the memory-mapped export in {COMPACT_DIR} (python ml/compact_model.py) instead of the joblib pickle.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Shard candidates across N processes (default 1: score in this process).')
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'Reuse results for unchanged candidates from {CACHE_PATH}; only new or changed ones are scored.')
+    parser.add_argument('--rebuild-index', action='store_true',
+                        help='Re-vectorize the approved catalog (and rebuild the dedup index) even if a cached one matches.')
+    parser.add_argument('--known', choices=('tag', 'skip', 'score'), default='tag',
+                        help="Candidates already in the catalog, archive or a backup: 'tag' them with mlKnown "
+                             "without scoring (default), 'skip' them, or 'score' them like any other.")
+    return parser.parse_args()
 
 
 def main():
-    if not MODEL_PATH.exists():
-        raise SystemExit(f"Model not found at {MODEL_PATH}. Train first.")
-    model = joblib.load(MODEL_PATH)
+    args = parse_args()
+    version = args.model_version
+    model_path = MODEL_PATHS[version]
+    if not model_path.exists():
+        raise SystemExit(f"Model not found at {model_path}. Train first.")
+    if args.compact and version != 'v1':
+        raise SystemExit('--compact is only available for the v1 model.')
+    t0 = time.perf_counter()
+    model = load_model(args.compact, version)
+    print(f"Loaded {'compact' if args.compact else 'joblib'} model in {(time.perf_counter() - t0) * 1000:.0f}ms")
 
     if not CANDIDATES_PATH.exists():
         raise SystemExit(f"Candidates not found at {CANDIDATES_PATH}.")
-    candidates = json.loads(CANDIDATES_PATH.read_text(encoding='utf-8'))
-
-    approved_items = load_approved()
-    approved_texts = [it['text'] for it in approved_items]
-    approved_vecs = model['tfidf'].transform(approved_texts)
-
-    out = []
-    for c in candidates:
-        text = to_text(c.get('name'), c.get('description'), c.get('tags'))
-        X = model['tfidf'].transform([text])
-        proba = float(model['clf'].predict_proba(X)[0, 1])
-        decision = 'approve' if proba >= 0.6 else 'reject'
-
-        sims = cosine_similarity(X, approved_vecs)[0]
-        idxs = sims.argsort()[-3:][::-1]
-        similar = [{
-            'name': approved_items[i]['name'],
-            'domainSlug': approved_items[i]['domainSlug'],
-            'score': float(sims[i])
-        } for i in idxs]
-
-        c = dict(c)
-        c['mlScore'] = proba
-        c['mlDecision'] = decision
-        c['mlVersion'] = 'v1'
-        c['mlSimilar'] = similar
-        out.append(c)
-
-    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    OUTPUT_PATH.write_text(json.dumps(out, indent=2), encoding='utf-8')
-    print(f"Wrote {OUTPUT_PATH}")
+    candidates = iter_pending_items(CANDIDATES_PATH)
+
+    t0 = time.perf_counter()
+    index, built = load_or_build(model['tfidf'], load_approved, APPROVED_PATH, model_path,
+                                 version, rebuild=args.rebuild_index)
+    print(f"{'Built' if built else 'Loaded'} approved index {index.key} "
+          f"({len(index)} tools) in {(time.perf_counter() - t0) * 1000:.0f}ms")
+
+    params = {}
+    if args.neighbors == 'svd':
+        # Stored next to the index so it is pruned together with it.
+        params['cache_path'] = INDEX_DIR / f'{INDEX_PREFIX}{index.key}.svd.joblib'
+    search = make_search(args.neighbors, index.vectors, **params)
+
+    output = args.output or (NDJSON_OUTPUT_PATH if args.format == 'ndjson' else OUTPUT_PATH)
+    if args.gzip and output.suffix != '.gz':
+        output = output.with_name(output.name + '.gz')
+
+    batch_size = max(1, args.batch_size)
+    workers = max(1, args.workers)
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                   initargs=(index.key, args.neighbors, params, args.compact, version))
+
+        def score(cs):
+            # Incremental runs hand over one chunk of misses at a time; split
+            # it so every worker gets a share.
+            return score_parallel(pool, cs, max(1, -(-len(cs) // workers)), workers)
+    else:
+        def score(cs):
+            return score_batch(model, cs, index, search, batch_size, version)
+
+    cache = None
+    if args.incremental:
+        cache = ScoreCache(CACHE_PATH, f'{version}:{index.key}:{search.name}')
+
+    def pipeline(cs):
+        if cache is not None:
+            return score_incremental(score, cs, cache, batch_size, version)
+        if pool is not None:
+            return score_parallel(pool, cs, batch_size, workers)
+        return score(cs)
+
+    known = None
+    if args.known != 'score':
+        t0 = time.perf_counter()
+        known, built = dedup_index.load_or_build(rebuild=args.rebuild_index)
+        print(f"{'Built' if built else 'Loaded'} dedup index {known.key} "
+              f"({len(known)} keys) in {(time.perf_counter() - t0) * 1000:.0f}ms")
+        records = screen_known(pipeline, candidates, known, args.known == 'skip', version)
+    else:
+        records = pipeline(candidates)
+
+    t0 = time.perf_counter()
+    try:
+        with open_writer(output, args.format) as writer:
+            for record in records:
+                writer.write(record)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    print(f"Scored {writer.count} candidates in {time.perf_counter() - t0:.2f}s"
+          + (f" across {workers} workers" if pool is not None else ''))
+    if known is not None:
+        counts = ', '.join(f'{n} {status}' for status, n in sorted(known.matched.items())) or 'none'
+        print(f"Known tools {'skipped' if args.known == 'skip' else 'tagged'} before scoring: {counts}")
+    if cache is not None:
+        cache.save()
+        print(f"Score cache: {cache.hits} hits, {cache.misses} misses "
+              f"({cache.hit_rate:.1%} hit rate)")
+    print(f"Wrote {output}")
 
 
 if __name__ == '__main__':
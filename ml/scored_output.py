@@ -0,0 +1,120 @@
+"""Writers for scored candidates, one record at a time.
+
+- ``json``:   the indented array the admin UI fetches (pending-tools.scored.json).
+              Streamed to a temp file and renamed when complete, so readers never
+              see half an array. Byte-identical to ``json.dumps(records, indent=2)``.
+- ``ndjson``: one compact record per line, optionally gzip'd (``.gz``), readable
+              while the run is still going.
+
+Convert NDJSON back to the admin UI format with:
+  python ml/scored_output.py data/pending-tools.scored.ndjson.gz -o data/pending-tools.scored.json
+"""
+import argparse
+import gzip
+import json
+import os
+from pathlib import Path
+
+FORMATS = ('json', 'ndjson')
+
+
+def _open_text(path: Path, mode: str, compress: bool | None = None):
+    """Open ``path`` as text, gzip'd when ``compress`` (default: a ``.gz`` suffix)."""
+    if compress is None:
+        compress = path.suffix == '.gz'
+    if compress:
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class JSONArrayWriter:
+    """Writes to ``<path>.tmp`` and renames; compression follows ``path``, not the temp name.
+
+    >>> import tempfile
+    >>> out = Path(tempfile.mkdtemp()) / 'scored.json.gz'
+    >>> with JSONArrayWriter(out) as w:
+    ...     w.write({'name': 'a'})
+    >>> out.read_bytes()[:2] == b'\\x1f\\x8b'
+    True
+    >>> with gzip.open(out, 'rt', encoding='utf-8') as f:
+    ...     json.load(f)
+    [{'name': 'a'}]
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.tmp = self.path.with_name(self.path.name + '.tmp')
+        self.count = 0
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.f = _open_text(self.tmp, 'w', compress=self.path.suffix == '.gz')
+        return self
+
+    def write(self, record):
+        # Indent each record by one level, exactly as json.dumps(list, indent=2) would.
+        body = json.dumps(record, indent=2).replace('\n', '\n  ')
+        self.f.write(('[\n  ' if self.count == 0 else ',\n  ') + body)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.f.write('\n]' if self.count else '[]')
+        self.f.close()
+        if exc_type is None:
+            os.replace(self.tmp, self.path)
+        else:
+            self.tmp.unlink(missing_ok=True)
+        return False
+
+
+class NDJSONWriter:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.count = 0
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.f = _open_text(self.path, 'w')
+        return self
+
+    def write(self, record):
+        self.f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        self.f.close()
+        return False
+
+
+def open_writer(path: Path, fmt: str):
+    if fmt == 'ndjson':
+        return NDJSONWriter(path)
+    return JSONArrayWriter(path)
+
+
+def iter_ndjson(path: Path):
+    with _open_text(Path(path), 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def ndjson_to_json(src: Path, dst: Path) -> int:
+    with JSONArrayWriter(dst) as w:
+        for record in iter_ndjson(src):
+            w.write(record)
+    return w.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert scored NDJSON (.ndjson or .ndjson.gz) to the JSON array the admin UI reads.')
+    parser.add_argument('src', type=Path)
+    parser.add_argument('-o', '--output', type=Path, default=Path('data/pending-tools.scored.json'))
+    args = parser.parse_args()
+    count = ndjson_to_json(args.src, args.output)
+    print(f"Wrote {count} records to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
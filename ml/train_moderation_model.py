@@ -1,13 +1,27 @@
-import json
+import argparse
 import joblib
-import pandas as pd
 from pathlib import Path
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.pipeline import Pipeline
 
+from incremental_training import CHECKPOINT_PATH, LABELS, fit_online, train_incremental
+from json_stream import iter_json_array
+
 DATA_PATH = Path('data/submissions_labeled.json')
-MODEL_PATH = Path('ml/model_v1.joblib')
+MODEL_PATHS = {
+    'v1': Path('ml/model_v1.joblib'),
+    'v2': Path('ml/model_v2.joblib'),
+    'v3': Path('ml/model_v3.joblib'),
+}
+MODEL_PATH = MODEL_PATHS['v1']
+# v2 and v3 hash terms into a fixed number of columns instead of learning a
+# vocabulary, so fit memory and model size do not grow with the corpus.
+HASH_FEATURES = 2 ** 18
+# Their idf and coefficient arrays are constant for unseen hash buckets and
+# compress to a fraction of their raw size; v1 stays uncompressed so workers
+# can memory-map it.
+COMPRESS = {'v1': 0, 'v2': 3, 'v3': 3}
 
 
 def to_text(name, description, tags):
@@ -20,28 +34,91 @@ def to_text(name, description, tags):
     return f"{name} {description} {tags}".strip()
 
 
-def main():
-    if not DATA_PATH.exists():
-        raise SystemExit(f"Missing labeled data at {DATA_PATH}. Provide JSON with fields: name, description, tags, status")
+def row_text(r):
+    return to_text(r.get('name'), r.get('description'), r.get('tags'))
 
-    df = pd.read_json(DATA_PATH)
-    df = df[df['status'].isin(['approved', 'rejected'])].copy()
-    if df.empty:
-        raise SystemExit('No labeled rows with status approved/rejected found.')
 
-    df['text'] = [to_text(r.get('name'), r.get('description'), r.get('tags')) for r in df.to_dict(orient='records')]
-    df['label'] = (df['status'] == 'approved').astype(int)
+def load_labeled(path=DATA_PATH):
+    # Stream rows so only the texts and labels are held, not the raw records.
+    texts, labels = [], []
+    for r in iter_json_array(path):
+        if r.get('status') not in LABELS:
+            continue
+        texts.append(row_text(r))
+        labels.append(LABELS[r['status']])
+    return texts, labels
 
-    pipe = Pipeline([
-        ('tfidf', TfidfVectorizer(max_features=50000, ngram_range=(1, 2)) ),
+
+def build_pipeline(version='v1'):
+    """Every version exposes the same ``tfidf`` and ``clf`` steps, so the
+    scoring code does not care which one it loads."""
+    if version == 'v3':
+        # Online model: no idf (it would need corpus-wide counts), just
+        # l2-normalised hashed counts, trained with partial_fit.
+        return Pipeline([
+            ('tfidf', HashingVectorizer(n_features=HASH_FEATURES, ngram_range=(1, 2), alternate_sign=False)),
+            ('clf', SGDClassifier(loss='log_loss', alpha=1e-5, random_state=0)),
+        ])
+    if version == 'v2':
+        tfidf = Pipeline([
+            ('hash', HashingVectorizer(n_features=HASH_FEATURES, ngram_range=(1, 2),
+                                       alternate_sign=False, norm=None)),
+            ('idf', TfidfTransformer()),
+        ])
+    else:
+        tfidf = TfidfVectorizer(max_features=50000, ngram_range=(1, 2))
+    return Pipeline([
+        ('tfidf', tfidf),
         ('clf', LogisticRegression(max_iter=200, class_weight='balanced')),
     ])
 
-    pipe.fit(df['text'], df['label'])
 
-    MODEL_PATH.parent.mkdir(parents=True, exist_ok=True)
-    joblib.dump(pipe, MODEL_PATH)
-    print(f"Saved {MODEL_PATH}")
+def fit_model(version, texts, labels):
+    pipe = build_pipeline(version)
+    if version == 'v3':
+        return fit_online(pipe, texts, labels)
+    return pipe.fit(texts, labels)
+
+
+def save_model(pipe, version='v1', path=None):
+    path = Path(path or MODEL_PATHS[version])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(pipe, path, compress=COMPRESS[version])
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the moderation classifier.')
+    parser.add_argument('--model-version', choices=sorted(MODEL_PATHS), default='v1',
+                        help="'v1' TF-IDF vocabulary (default), 'v2' hashing vectorizer + TF-IDF transformer, "
+                             "or 'v3' hashing vectorizer + online SGD (full pass, new checkpoint).")
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'Update the v3 model with only the rows added since {CHECKPOINT_PATH}.')
+    args = parser.parse_args()
+    if args.incremental:
+        args.model_version = 'v3'
+
+    if not DATA_PATH.exists():
+        raise SystemExit(f"Missing labeled data at {DATA_PATH}. Provide JSON with fields: name, description, tags, status")
+
+    if args.model_version == 'v3':
+        path = MODEL_PATHS['v3']
+        checkpoint, learned, resumed = train_incremental(
+            lambda: build_pipeline('v3'), row_text, DATA_PATH, path,
+            reset=not args.incremental, compress=COMPRESS['v3'])
+        if learned:
+            print(f"Saved {path}: trained on {learned} {'new ' if resumed else ''}labeled rows "
+                  f"({checkpoint.rows} rows consumed in total)")
+        else:
+            print(f"No new labeled rows since the checkpoint; {path} unchanged")
+        return
+
+    texts, labels = load_labeled(DATA_PATH)
+    if not texts:
+        raise SystemExit('No labeled rows with status approved/rejected found.')
+
+    path = save_model(fit_model(args.model_version, texts, labels), args.model_version)
+    print(f"Saved {path}")
 
 
 if __name__ == '__main__':
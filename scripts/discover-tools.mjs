@@ -1881,8 +1881,10 @@ async function main(){
           for(const it of Array.isArray(pending.items)? pending.items : []){
             const match = byName.get(normalizeKey(it.name));
             if(match){
-              const { mlScore, mlDecision, mlSimilar, mlVersion } = match;
+              const { mlScore, mlDecision, mlSimilar, mlVersion, mlKnown } = match;
               const enriched = { ...it, mlScore, mlDecision, mlSimilar, mlVersion };
+              // Already in the catalog, archive or a backup (score_candidates.py --known tag)
+              if(mlKnown) enriched.mlKnown = mlKnown;
               // Optionally skip low-scored rejects
               if(String(mlDecision).toLowerCase()==='reject' && Number(mlScore||0) < threshold){
                 continue; // skip
@@ -1913,7 +1915,10 @@ async function main(){
                   ref = q2?.docs?.[0]?.ref;
                 }
                 if (ref) {
-                  const patch = { mlScore: Number(it.mlScore||0), mlDecision: String(it.mlDecision||''), mlVersion: String(it.mlVersion||'v1') };
+                  const patch = { mlDecision: String(it.mlDecision||''), mlVersion: String(it.mlVersion||'v1') };
+                  // Known tools are not scored; leave any earlier mlScore alone rather than writing 0
+                  if (typeof it.mlScore === 'number') patch.mlScore = it.mlScore;
+                  if (it.mlKnown) patch.mlKnown = it.mlKnown;
                   if (Array.isArray(it.mlSimilar)) patch.mlSimilar = it.mlSimilar.slice(0,3);
                   await ref.set(patch, { merge: true });
                 }
@@ -9,26 +9,85 @@ Outputs:
   artifacts:
     tests/output/failures.json  (structured data)
     tests/output/failures.md    (markdown report)
+    tests/output/summary-stats.json (pass/fail counts, slowest tests, time by phase, trend)
+    tests/output/report-history.sqlite (per-run, per-feature counts; see --history)
+Failures are split using the retry/history columns written by
+tests/ui_history.py: a failing test whose flakiness score (pass/fail flip rate
+over recent runs) is at least FLAKY_THRESHOLD is reported as flaky, the rest
+as stable. Tests that failed and then passed on a retry are listed separately.
+
+Rows are streamed: only failures, per-feature counters and the SLOWEST_N
+timings are held in memory, however many results.csv files there are. Each
+run's per-feature counts are then appended to a small SQLite history (one row
+per run and feature, keyed by --run-id so re-running the summary replaces the
+run instead of duplicating it), and the reports add a pass-rate trend over the
+last --trend-runs runs, computed by SQL over up to HISTORY_KEEP stored runs.
+
+With --merge the CSVs are read in a thread pool and deduplicated by
+(run id, shard, test id), the last attempt winning, so a re-run shard whose
+artifacts sit next to the original (e.g. shard-3/attempt-2/results.csv) is
+counted once.
+
 Exit code:
-  0 if no failures
-  1 if at least one fail
+  0 if no stable failures
+  1 if at least one stable fail (or any fail with --strict)
 
 Usage:
-  python scripts/parse-test-failures.py
+  python scripts/parse-test-failures.py [--strict] [--flaky-threshold 0.2]
+  python scripts/parse-test-failures.py --run-id 1234 --trend-runs 20
+  python scripts/parse-test-failures.py --history ''   # no history / trend
+  python scripts/parse-test-failures.py --merge --jobs 16  # sharded CI artifacts
 """
 from __future__ import annotations
+import argparse
 import csv
+import heapq
 import json
 import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
 from glob import glob
-from typing import List, Dict
+from typing import Dict, Iterator, List, Tuple
 
 RESULT_GLOB = "tests/output/**/results.csv"
 OUT_DIR = "tests/output"
 FAIL_JSON = os.path.join(OUT_DIR, "failures.json")
 FAIL_MD = os.path.join(OUT_DIR, "failures.md")
 STATS_JSON = os.path.join(OUT_DIR, "summary-stats.json")
+HISTORY_DB = os.path.join(OUT_DIR, "report-history.sqlite")
+# Timing columns written by tests/ui_timing.py (absent in older results.csv)
+PHASE_COLUMNS = ('goto_ms', 'click_ms', 'wait_ms', 'shot_ms')
+STATUSES = ('pass', 'fail', 'skipped', 'blocked')
+SLOWEST_N = 10
+FLAKY_THRESHOLD = 0.2
+TREND_RUNS = 10
+HISTORY_KEEP = 500
+# A directory named attempt-N (or attempt_N / attemptN) holds a re-run of its shard
+ATTEMPT_DIR = re.compile(r'attempt[-_]?(\d+)', re.IGNORECASE)
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_key TEXT NOT NULL UNIQUE,
+    recorded_at REAL NOT NULL,
+    git_sha TEXT
+);
+CREATE TABLE IF NOT EXISTS run_features (
+    feature TEXT NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    passed INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    skipped INTEGER NOT NULL,
+    blocked INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    duration_ms REAL NOT NULL,
+    PRIMARY KEY (feature, run_id)
+) WITHOUT ROWID;
+"""
 
 @dataclass
 class Failure:
@@ -37,49 +96,241 @@ class Failure:
     title: str
     details: str
     screenshot: str | None
+    attempts: int = 1
+    flakiness: float = 0.0
+
+@dataclass
+class Timing:
+    id: str
+    feature: str
+    duration_ms: float
+    phases_ms: Dict[str, float]
+
+def _ms(value) -> float:
+    try:
+        return float(value or 0)
+    except ValueError:
+        return 0.0
 
 def find_results() -> List[str]:
     return [p for p in glob(RESULT_GLOB, recursive=True) if os.path.isfile(p)]
 
-def parse_results(paths: List[str]):
+def _flag(value) -> bool:
+    return str(value or '').strip().lower() in ('true', '1', 'yes')
+
+def iter_rows(paths: List[str]) -> Iterator[Dict[str, str]]:
+    """Yield result rows one at a time across all results.csv files."""
+    for p in paths:
+        with open(p, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+
+class TimingSummary:
+    """Running phase totals and a bounded heap of the slowest tests."""
+    def __init__(self, n: int = SLOWEST_N):
+        self.n = n
+        self.count = 0
+        self.wall_ms = 0.0
+        self.phases_ms = {c[:-3]: 0.0 for c in PHASE_COLUMNS}
+        self.by_feature_ms: Dict[str, float] = {}
+        self._slowest: List = []
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, t: Timing) -> None:
+        self.count += 1
+        self.wall_ms += t.duration_ms
+        for phase, ms in t.phases_ms.items():
+            self.phases_ms[phase] += ms
+        self.by_feature_ms[t.feature] = self.by_feature_ms.get(t.feature, 0.0) + t.duration_ms
+        item = (t.duration_ms, -self.count, t)
+        if len(self._slowest) < self.n:
+            heapq.heappush(self._slowest, item)
+        elif item > self._slowest[0]:
+            heapq.heapreplace(self._slowest, item)
+
+    def summary(self) -> Dict:
+        phases = {k: round(v, 1) for k, v in self.phases_ms.items()}
+        phases['other'] = round(max(0.0, self.wall_ms - sum(phases.values())), 1)
+        slowest = [t for _, _, t in sorted(self._slowest, reverse=True)]
+        return {"total_ms": round(self.wall_ms, 1), "phases_ms": phases, "slowest": [asdict(t) for t in slowest]}
+
+def shard_of(path: str) -> Tuple[str, int]:
+    """(shard, shard attempt) for a results.csv: its directory under OUT_DIR minus any attempt-N part."""
+    shard, attempt = [], 1
+    for part in os.path.relpath(os.path.dirname(path), OUT_DIR).split(os.sep):
+        m = ATTEMPT_DIR.fullmatch(part)
+        if m:
+            attempt = max(attempt, int(m.group(1)))
+        else:
+            shard.append(part)
+    return '/'.join(shard) or '.', attempt
+
+def _read_shard(path: str):
+    shard, attempt = shard_of(path)
+    with open(path, newline='', encoding='utf-8') as f:
+        return shard, attempt, list(csv.DictReader(f))
+
+def merge_rows(paths: List[str], run_key: str = '', jobs: int | None = None) -> Iterator[Dict[str, str]]:
+    """Rows from shard CSVs read in a thread pool, one per (run id, shard, test id).
+
+    The run id and shard come from ``run_id``/``shard`` columns when present,
+    else ``run_key`` and the file's directory (see shard_of). Of duplicate rows
+    the last attempt wins: highest shard attempt, then highest ``attempts``
+    column, then the most recently written file.
+    """
+    paths = sorted(paths, key=os.path.getmtime)
+    merged: Dict[Tuple[str, str, str], Tuple[Tuple, Dict[str, str]]] = {}
+    n_rows = 0
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for order, (shard, attempt, rows) in enumerate(pool.map(_read_shard, paths)):
+            for row in rows:
+                n_rows += 1
+                key = (row.get('run_id') or run_key, row.get('shard') or shard, row.get('id') or 'UNKNOWN')
+                rank = (attempt, int(_ms(row.get('attempts')) or 1), order)
+                if key not in merged or rank >= merged[key][0]:
+                    merged[key] = (rank, row)
+    print(f"Merged {len(paths)} file(s): {n_rows} rows, {n_rows - len(merged)} duplicate(s) dropped", file=sys.stderr)
+    for _, row in merged.values():
+        yield row
+
+def parse_results(paths: List[str], merge: bool = False, run_key: str = '', jobs: int | None = None):
     failures: Dict[str, List[Failure]] = {}
+    passed_on_retry: List[Failure] = []
     # stats per feature: { feature: {pass: int, fail: int, skipped: int, blocked: int, total: int} }
     stats: Dict[str, Dict[str, int]] = {}
-    for p in paths:
-        with open(p, newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                feature = row.get('feature') or 'Unknown'
-                status = (row.get('status') or '').strip().lower()
-                if feature not in stats:
-                    stats[feature] = {k: 0 for k in ('pass','fail','skipped','blocked','total')}
-                if status not in ('pass','fail','skipped','blocked'):
-                    # treat unknown as blocked for visibility
-                    status = 'blocked'
-                stats[feature][status] += 1
-                stats[feature]['total'] += 1
-                if status == 'fail':
-                    failures.setdefault(feature, []).append(
-                        Failure(
-                            id=row.get('id') or 'UNKNOWN',
-                            feature=feature,
-                            title=row.get('title') or '',
-                            details=row.get('details') or '',
-                            screenshot=row.get('screenshot') or None,
-                        )
-                    )
-    return failures, stats
-
-def write_outputs(failures: Dict[str, List[Failure]], stats: Dict[str, Dict[str, int]]):
+    timings = TimingSummary()
+    for row in (merge_rows(paths, run_key, jobs) if merge else iter_rows(paths)):
+        feature = row.get('feature') or 'Unknown'
+        status = (row.get('status') or '').strip().lower()
+        if feature not in stats:
+            stats[feature] = {k: 0 for k in STATUSES + ('total',)}
+        if status not in STATUSES:
+            # treat unknown as blocked for visibility
+            status = 'blocked'
+        stats[feature][status] += 1
+        stats[feature]['total'] += 1
+        if row.get('duration_ms'):
+            timings.add(Timing(
+                id=row.get('id') or 'UNKNOWN',
+                feature=feature,
+                duration_ms=_ms(row.get('duration_ms')),
+                phases_ms={c[:-3]: _ms(row.get(c)) for c in PHASE_COLUMNS},
+            ))
+        if status == 'fail' or _flag(row.get('flaky')):
+            entry = Failure(
+                id=row.get('id') or 'UNKNOWN',
+                feature=feature,
+                title=row.get('title') or '',
+                details=row.get('details') or '',
+                screenshot=row.get('screenshot') or None,
+                attempts=int(_ms(row.get('attempts')) or 1),
+                flakiness=_ms(row.get('flakiness')),
+            )
+            if status == 'fail':
+                failures.setdefault(feature, []).append(entry)
+            else:
+                passed_on_retry.append(entry)
+    return failures, stats, timings, passed_on_retry
+
+def split_flaky(failures: Dict[str, List[Failure]], threshold: float = FLAKY_THRESHOLD):
+    """(stable, flaky) failures, each keyed by feature."""
+    stable: Dict[str, List[Failure]] = {}
+    flaky: Dict[str, List[Failure]] = {}
+    for feature, flist in failures.items():
+        for f in flist:
+            (flaky if f.flakiness >= threshold else stable).setdefault(feature, []).append(f)
+    return stable, flaky
+
+def summarize_timings(timings) -> Dict:
+    if not isinstance(timings, TimingSummary):
+        acc = TimingSummary()
+        for t in timings:
+            acc.add(t)
+        timings = acc
+    return timings.summary()
+
+def default_run_key() -> str:
+    run_id = os.environ.get('GITHUB_RUN_ID')
+    return run_id or time.strftime('local-%Y%m%d-%H%M%S')
+
+class ReportHistory:
+    """Per-run, per-feature result counts in SQLite; trends are computed by SQL."""
+    def __init__(self, path: str = HISTORY_DB):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(HISTORY_SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def record(self, run_key: str, stats: Dict[str, Dict[str, int]], timings: TimingSummary,
+               keep: int = HISTORY_KEEP) -> int:
+        """Store this run's counts, replacing an earlier record under the same key."""
+        with self.db:
+            self.db.execute(
+                'INSERT INTO runs (run_key, recorded_at, git_sha) VALUES (?, ?, ?) '
+                'ON CONFLICT(run_key) DO UPDATE SET recorded_at = excluded.recorded_at, git_sha = excluded.git_sha',
+                (run_key, time.time(), os.environ.get('GITHUB_SHA')))
+            (run_id,) = self.db.execute('SELECT id FROM runs WHERE run_key = ?', (run_key,)).fetchone()
+            self.db.execute('DELETE FROM run_features WHERE run_id = ?', (run_id,))
+            self.db.executemany(
+                'INSERT INTO run_features (feature, run_id, passed, failed, skipped, blocked, total, duration_ms) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(feature, run_id, s['pass'], s['fail'], s['skipped'], s['blocked'], s['total'],
+                  round(timings.by_feature_ms.get(feature, 0.0), 1)) for feature, s in stats.items()])
+            cutoff = self.db.execute('SELECT id FROM runs ORDER BY id DESC LIMIT 1 OFFSET ?', (keep,)).fetchone()
+            if cutoff:
+                self.db.execute('DELETE FROM run_features WHERE run_id <= ?', cutoff)
+                self.db.execute('DELETE FROM runs WHERE id <= ?', cutoff)
+        return run_id
+
+    def trend(self, runs: int = TREND_RUNS) -> Dict:
+        """Pass rate per feature for the last ``runs`` runs, plus totals over all stored runs."""
+        recent = self.db.execute('SELECT id, run_key FROM runs ORDER BY id DESC LIMIT ?', (runs,)).fetchall()[::-1]
+        column = {run_id: i for i, (run_id, _) in enumerate(recent)}
+        pass_rate: Dict[str, List] = {}
+        if recent:
+            for feature, run_id, passed, total in self.db.execute(
+                    'SELECT feature, run_id, passed, total FROM run_features WHERE run_id >= ?', (recent[0][0],)):
+                rates = pass_rate.setdefault(feature, [None] * len(recent))
+                rates[column[run_id]] = round(passed / total, 3) if total else None
+        overall = {feature: {"runs": n, "pass_rate": round(passed / total, 3) if total else None}
+                   for feature, n, passed, total in self.db.execute(
+                       'SELECT feature, COUNT(*), SUM(passed), SUM(total) FROM run_features GROUP BY feature')}
+        return {"runs": [key for _, key in recent], "pass_rate": pass_rate, "all_runs": overall}
+
+def _failure_line(f: Failure) -> str:
+    shot = f.screenshot or ''
+    shot_note = f" Screenshot: {shot}" if shot else ''
+    details = (f.details or '').replace('\n', ' ')
+    if len(details) > 160:
+        details = details[:157] + '...'
+    return f"- **{f.id}** {f.title} – {details}{shot_note}"
+
+def _pct(rate) -> str:
+    return '–' if rate is None else f"{rate * 100:.0f}%"
+
+def write_outputs(failures: Dict[str, List[Failure]], stats: Dict[str, Dict[str, int]], timings: TimingSummary,
+                  passed_on_retry: List[Failure] = (), threshold: float = FLAKY_THRESHOLD, trend: Dict | None = None):
     os.makedirs(OUT_DIR, exist_ok=True)
     flat = [asdict(f) for fl in failures.values() for f in fl]
+    stable, flaky = split_flaky(failures, threshold)
+    n_stable = sum(len(v) for v in stable.values())
+    n_flaky = sum(len(v) for v in flaky.values())
     with open(FAIL_JSON, 'w', encoding='utf-8') as jf:
-        json.dump({"total_failures": len(flat), "by_feature": {k: [asdict(f) for f in v] for k, v in failures.items()}}, jf, indent=2)
+        json.dump({"total_failures": len(flat), "stable_failures": n_stable, "flaky_failures": n_flaky,
+                   "flaky_threshold": threshold,
+                   "by_feature": {k: [asdict(f) for f in v] for k, v in failures.items()},
+                   "flaky": {k: [f.id for f in v] for k, v in flaky.items()},
+                   "passed_on_retry": [asdict(f) for f in passed_on_retry]}, jf, indent=2)
 
     # Overall stats summary JSON
-    overall = {k: sum(stats[f][k] for f in stats) for k in ('pass','fail','skipped','blocked','total')}
+    overall = {k: sum(stats[f][k] for f in stats) for k in STATUSES + ('total',)}
+    timing = summarize_timings(timings) if timings else None
     with open(STATS_JSON, 'w', encoding='utf-8') as sf:
-        json.dump({"overall": overall, "features": stats}, sf, indent=2)
+        json.dump({"overall": overall, "features": stats, "timing": timing, "trend": trend}, sf, indent=2)
 
     # Markdown
     lines: List[str] = []
@@ -95,19 +346,46 @@ def write_outputs(failures: Dict[str, List[Failure]], stats: Dict[str, Dict[str,
             pass_pct = f"{(s['pass'] / total_feat)*100:.1f}%"
             lines.append(f"{feature} | {s['pass']} | {s['fail']} | {s['skipped']} | {s['blocked']} | {s['total']} | {pass_pct}")
 
+    if timing:
+        wall = timing['total_ms'] or 1
+        lines.append(f"\n## Time by Phase ({wall / 1000:.1f}s total)\n")
+        lines.append("Phase | Seconds | Share")
+        lines.append("----- | ------- | -----")
+        for phase, ms in sorted(timing['phases_ms'].items(), key=lambda kv: kv[1], reverse=True):
+            lines.append(f"{phase} | {ms / 1000:.1f} | {ms / wall * 100:.1f}%")
+        lines.append(f"\n## Slowest Tests\n")
+        lines.append("Test | Feature | Seconds | " + " | ".join(c[:-3] for c in PHASE_COLUMNS))
+        lines.append("---- | ------- | ------- | " + " | ".join('-' * len(c[:-3]) for c in PHASE_COLUMNS))
+        for t in timing['slowest']:
+            lines.append(f"{t['id']} | {t['feature']} | {t['duration_ms'] / 1000:.2f} | "
+                         + " | ".join(f"{v / 1000:.2f}" for v in t['phases_ms'].values()))
+
+    if trend and len(trend['runs']) > 1:
+        runs = trend['runs']
+        lines.append(f"\n## Pass Rate Trend (last {len(runs)} runs)\n")
+        lines.append("Feature | " + " | ".join(runs) + " | All runs")
+        lines.append("------- | " + " | ".join('-' * len(r) for r in runs) + " | --------")
+        for feature, rates in sorted(trend['pass_rate'].items()):
+            overall_feat = trend['all_runs'].get(feature, {})
+            lines.append(f"{feature} | " + " | ".join(_pct(r) for r in rates)
+                         + f" | {_pct(overall_feat.get('pass_rate'))} ({overall_feat.get('runs', 0)})")
+
     if total == 0:
         lines.append("\nAll tests passed.\n")
     else:
-        lines.append(f"\nTotal failures: **{total}**\n")
-        for feature, flist in failures.items():
+        lines.append(f"\nTotal failures: **{total}** ({n_stable} stable, {n_flaky} flaky)\n")
+        for feature, flist in stable.items():
             lines.append(f"\n### {feature} Failures ({len(flist)})\n")
-            for f in flist:
-                shot = f.screenshot or ''
-                shot_note = f" Screenshot: {shot}" if shot else ''
-                details = (f.details or '').replace('\n', ' ')
-                if len(details) > 160:
-                    details = details[:157] + '...'
-                lines.append(f"- **{f.id}** {f.title} – {details}{shot_note}")
+            lines.extend(_failure_line(f) for f in flist)
+        if flaky:
+            lines.append(f"\n## Flaky Failures (flakiness >= {threshold})\n")
+            for feature, flist in flaky.items():
+                lines.append(f"\n### {feature} ({len(flist)})\n")
+                lines.extend(f"{_failure_line(f)} (flakiness {f.flakiness:.2f})" for f in flist)
+    if passed_on_retry:
+        lines.append(f"\n## Passed on Retry ({len(passed_on_retry)})\n")
+        for f in passed_on_retry:
+            lines.append(f"- **{f.id}** {f.title} – attempt {f.attempts}, flakiness {f.flakiness:.2f}")
     with open(FAIL_MD, 'w', encoding='utf-8') as mf:
         mf.write('\n'.join(lines) + '\n')
     # Echo markdown to stdout
@@ -115,12 +393,38 @@ def write_outputs(failures: Dict[str, List[Failure]], stats: Dict[str, Dict[str,
 
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--strict', action='store_true', help='Exit 1 on flaky failures too.')
+    parser.add_argument('--flaky-threshold', type=float, default=FLAKY_THRESHOLD,
+                        help=f'Flakiness score at which a failure counts as flaky (default {FLAKY_THRESHOLD}).')
+    parser.add_argument('--history', default=HISTORY_DB,
+                        help=f"SQLite run history to append to and trend from ('' disables; default {HISTORY_DB}).")
+    parser.add_argument('--run-id', default=None,
+                        help='Key for this run in the history; re-using a key replaces that run '
+                             '(default $GITHUB_RUN_ID, else a timestamp).')
+    parser.add_argument('--trend-runs', type=int, default=TREND_RUNS,
+                        help=f'Runs shown in the pass rate trend table (default {TREND_RUNS}).')
+    parser.add_argument('--merge', action='store_true',
+                        help='Read shard CSVs in a thread pool and keep the last attempt of each '
+                             '(run id, shard, test id).')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Reader threads for --merge (default: ThreadPoolExecutor default).')
+    args = parser.parse_args()
+    run_key = args.run_id or default_run_key()
     paths = find_results()
-    failures, stats = parse_results(paths)
-    write_outputs(failures, stats)
-    total = sum(len(v) for v in failures.values())
-    # Non-zero exit if there are failures (allows workflow conditional steps)
-    if total > 0:
+    failures, stats, timings, passed_on_retry = parse_results(paths, args.merge, run_key, args.jobs)
+    trend = None
+    if args.history and stats:
+        history = ReportHistory(args.history)
+        try:
+            history.record(run_key, stats, timings)
+            trend = history.trend(args.trend_runs)
+        finally:
+            history.close()
+    write_outputs(failures, stats, timings, passed_on_retry, args.flaky_threshold, trend)
+    stable, flaky = split_flaky(failures, args.flaky_threshold)
+    # Non-zero exit if there are stable failures (allows workflow conditional steps)
+    if stable or (args.strict and flaky):
         exit(1)
 
 if __name__ == '__main__':
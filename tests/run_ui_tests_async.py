@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Asyncio engine for the AI-Atlas UI test harness.
+
+Runs the same plan as run_ui_tests.py and produces the same TestResult rows
+(so write_results() emits identical CSV/Excel), but drives Chromium through
+the async Playwright API. Cases are grouped into lanes by id family (MN-*,
+SR-*, FD-*, FD-M*, ...), which keeps each feature's cases together; every lane
+owns its browser contexts and pages, and up to --concurrency lanes run at once
+in one process and one browser. Independent checks such as the mobile MN-*
+cases and the desktop SR-* cases therefore overlap instead of queueing behind
+each other's navigations and waits. Cases inside a lane keep plan order.
+Both engines run the same compiled case scripts (ui_steps.py).
+
+Usage:
+    python tests/run_ui_tests.py --engine async [--concurrency 4]
+"""
+
+from __future__ import annotations
+import asyncio
+import os
+import re
+from typing import Dict, List
+
+from playwright.async_api import async_playwright
+
+import ui_fixtures
+import ui_offline
+import ui_screenshots
+import ui_steps
+import ui_timing
+import ui_waits
+from run_ui_tests import TestCase, TestResult
+
+
+class Lane:
+    """One concurrent worker: lazily created contexts/pages plus its results."""
+
+    def __init__(self, browser, base_url: str, shots: str, fixtures: ui_fixtures.AsyncPageFixtures | None = None,
+                 screenshots: ui_screenshots.ShotOptions | None = None):
+        self.browser = browser
+        self.fixtures = fixtures
+        self.base_url = base_url.rstrip('/')
+        self.home = self.base_url + '/'
+        self.shots = shots
+        self.results: List[TestResult] = []
+        self.waits = ui_waits.WaitStats()
+        self.timer = ui_timing.CaseTimer()
+        self.camera = ui_screenshots.Screenshots(shots, screenshots)
+        self.tc: TestCase | None = None
+        self.last_page = None
+        self._contexts = {}
+        self._pages = {}
+
+    async def new_context(self, kind: str):
+        if self.fixtures is not None:
+            return await self.fixtures.new_context(**ui_steps.VIEWPORTS[kind])
+        return await self.browser.new_context(**ui_steps.VIEWPORTS[kind])
+
+    async def page(self, kind: str):
+        if kind not in self._pages:
+            self._contexts[kind] = await self.new_context(kind)
+            self._pages[kind] = await self._contexts[kind].new_page()
+        self.last_page = self._pages[kind]
+        return self.last_page
+
+    async def shot(self, name: str, page) -> str:
+        with self.timer.span('shot', 'shot'):
+            return await self.camera.capture_async(name, page)
+
+    async def record(self, status: str, details: str, page, shot_name: str | None = None) -> None:
+        tc = self.tc
+        self.results.append(TestResult(tc.id, tc.feature, tc.title, status, details,
+                                       await self.shot(shot_name or tc.id, page)))
+
+    async def discard(self, kind: str) -> None:
+        if kind in self._contexts:
+            self._pages.pop(kind)
+            await self._contexts.pop(kind).close()
+
+    async def close(self) -> None:
+        for kind in list(self._contexts):
+            await self.discard(kind)
+        self.last_page = None
+
+
+def plan_lanes(plan: List[TestCase]) -> List[List[TestCase]]:
+    """Group cases by id family, e.g. FD-001.. and FD-M01.. become separate
+    desktop and mobile lanes (plan order kept inside each lane)."""
+    lanes: Dict[str, List[TestCase]] = {}
+    for tc in plan:
+        lanes.setdefault(re.sub(r'\d+$', '', tc.id), []).append(tc)
+    # Longest lanes first so they are not the last to start under --concurrency.
+    return sorted(lanes.values(), key=len, reverse=True)
+
+
+async def _run_lane(browser, base_url: str, shots: str, cases: List[TestCase],
+                    fixtures: ui_fixtures.AsyncPageFixtures | None = None,
+                    screenshots: ui_screenshots.ShotOptions | None = None) -> List[TestResult]:
+    compiled = ui_steps.compile_plan(cases)
+    t = Lane(browser, base_url, shots, fixtures, screenshots)
+    try:
+        for tc in cases:
+            if fixtures is not None:
+                await t.close()  # fresh contexts from the warm state for every case
+            t.tc = tc
+            first = len(t.results)
+            t.timer.start()
+            case = compiled.get(tc.id)
+            if not case:
+                t.results.append(TestResult(tc.id, tc.feature, tc.title, 'skipped', 'No script for test id', ''))
+                continue
+            try:
+                await ui_steps.run_case_async(case, t)
+            except Exception as e:
+                error_msg = f"{type(e).__name__}: {str(e)}"
+                screenshot_path = ''
+                try:
+                    if t.last_page is not None:
+                        screenshot_path = await t.shot(f'{tc.id}_ERROR', t.last_page)
+                except Exception:
+                    pass
+                t.results.append(TestResult(tc.id, tc.feature, tc.title, 'fail', error_msg[:200], screenshot_path))
+            with t.timer.span('shot', 'deferred_shots'):
+                await t.camera.settle_async(t.results[first:])
+            saved = t.waits.take()
+            for r in t.results[first:]:
+                r.wait_saved_ms = saved
+            t.timer.finish(t.results[first:])
+    finally:
+        await t.close()
+        t.camera.close(t.results)
+    return t.results
+
+
+async def run_ui_tests_async(base_url: str, out_dir: str, plan: List[TestCase], concurrency: int = 4,
+                             fixtures: bool = True,
+                             offline: ui_offline.OfflineConfig | None = None,
+                             screenshots: ui_screenshots.ShotOptions | None = None) -> List[TestResult]:
+    shots = os.path.join(out_dir, 'screenshots')
+    os.makedirs(shots, exist_ok=True)
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        if offline is not None:
+            browser = ui_offline.AsyncOfflineBrowser(browser, offline)
+        warm = (ui_fixtures.AsyncPageFixtures(browser, base_url.rstrip('/') + '/', cache_external=offline is None)
+                if fixtures else None)
+        try:
+            async def lane(cases):
+                async with sem:
+                    return await _run_lane(browser, base_url, shots, cases, warm, screenshots)
+
+            per_lane = await asyncio.gather(*(lane(cases) for cases in plan_lanes(plan)))
+        finally:
+            await browser.close()
+
+    order = {tc.id: i for i, tc in enumerate(plan)}
+    results = [r for rs in per_lane for r in rs]
+    results.sort(key=lambda r: order.get(r.id, len(order)))
+    return results
+
+
+def run_ui_tests_async_sync(base_url: str, out_dir: str, plan: List[TestCase], concurrency: int = 4,
+                            fixtures: bool = True,
+                            offline: ui_offline.OfflineConfig | None = None,
+                            screenshots: ui_screenshots.ShotOptions | None = None) -> List[TestResult]:
+    """Blocking entry point with run_ui_tests()'s signature (plus concurrency)."""
+    return asyncio.run(run_ui_tests_async(base_url, out_dir, plan, concurrency, fixtures, offline, screenshots))
@@ -0,0 +1,182 @@
+"""
+Per-worker page fixtures for the UI test engines.
+
+Nearly every case starts from the home page or the first domain's tool list.
+Instead of loading those from the server dozens of times per run, a worker
+warms them once:
+
+- every cacheable GET the warm-up triggers (index.html, tools.json, scripts,
+  styles, fonts, icons) is kept in a ResponseCache and answered from memory via
+  route interception afterwards;
+- the storage state (cookies + localStorage) after the home page settled is
+  snapshotted;
+- the URL of the first domain (``#domain=<slug>``) is recorded, so
+  goto_tools_first_domain() can open it directly instead of clicking through
+  the home page.
+
+Each case then gets a brand-new context built from that snapshot (so theme or
+login changes made by one case never leak into the next) whose loads come
+from the warm cache instead of the network. In --local mode only same-origin
+responses are cached here; other origins are left to ui_offline.py.
+"""
+
+from __future__ import annotations
+import asyncio
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+import ui_waits
+
+CACHED_RESOURCE_TYPES = {'document', 'script', 'stylesheet', 'image', 'font', 'fetch', 'xhr'}
+# Same-origin data and any static asset; API calls to other origins (auth,
+# analytics) always go to the network.
+STATIC_RESOURCE_TYPES = {'script', 'stylesheet', 'image', 'font'}
+
+
+class ResponseCache:
+    """URL -> (status, headers, body) for the worker's lifetime."""
+
+    def __init__(self, base_url: str, cache_external: bool = True):
+        self.origin = '{0.scheme}://{0.netloc}'.format(urlsplit(base_url))
+        self.cache_external = cache_external
+        self._entries: Dict[str, Tuple[int, dict, bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, request) -> bool:
+        if request.method != 'GET' or request.resource_type not in CACHED_RESOURCE_TYPES:
+            return False
+        if request.url.startswith(self.origin):
+            return True
+        return self.cache_external and request.resource_type in STATIC_RESOURCE_TYPES
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return url.split('#', 1)[0]
+
+    def get(self, url: str):
+        return self._entries.get(self._key(url))
+
+    def put(self, url: str, response, body: bytes) -> None:
+        if response.status == 200:
+            headers = {k: v for k, v in response.headers.items()
+                       if k.lower() not in ('content-length', 'content-encoding', 'transfer-encoding')}
+            self._entries[self._key(url)] = (response.status, headers, body)
+
+    # Route handlers -------------------------------------------------------
+    def handle(self, route) -> None:
+        request = route.request
+        if not self.cacheable(request):
+            route.fallback()
+            return
+        entry = self.get(request.url)
+        if entry is None:
+            self.misses += 1
+            response = route.fetch()
+            body = response.body()
+            self.put(request.url, response, body)
+            route.fulfill(response=response, body=body)
+            return
+        self.hits += 1
+        status, headers, body = entry
+        route.fulfill(status=status, headers=headers, body=body)
+
+    async def handle_async(self, route) -> None:
+        request = route.request
+        if not self.cacheable(request):
+            await route.fallback()
+            return
+        entry = self.get(request.url)
+        if entry is None:
+            self.misses += 1
+            response = await route.fetch()
+            body = await response.body()
+            self.put(request.url, response, body)
+            await route.fulfill(response=response, body=body)
+            return
+        self.hits += 1
+        status, headers, body = entry
+        await route.fulfill(status=status, headers=headers, body=body)
+
+
+def _domain_url(url: str) -> str | None:
+    return url if '#domain=' in url else None
+
+
+class PageFixtures:
+    """Warm home/first-domain state for the sync engine (one per worker)."""
+
+    def __init__(self, browser, home: str, cache_external: bool = True):
+        self.browser = browser
+        self.home = home
+        self.cache = ResponseCache(home, cache_external)
+        self.storage_state = None
+        self.domain_url: str | None = None
+        self._warm = False
+
+    def warm(self, **context_kwargs) -> None:
+        if self._warm:
+            return
+        ctx = self.browser.new_context(**context_kwargs)
+        try:
+            ctx.route('**/*', self.cache.handle)
+            page = ctx.new_page()
+            page.goto(self.home, wait_until='domcontentloaded', timeout=30000)
+            ui_waits.wait_for_initial_tools(page)
+            self.storage_state = ctx.storage_state()
+            try:
+                page.click('.domain-card', timeout=15000)
+                page.wait_for_selector('.open-tool-btn', timeout=20000)
+                self.domain_url = _domain_url(page.url)
+            except Exception:
+                self.domain_url = None  # goto_tools_first_domain falls back to clicking
+        finally:
+            ctx.close()
+            self._warm = True
+
+    def new_context(self, **context_kwargs):
+        """Fresh context from the warm snapshot, served from the cache."""
+        self.warm(**context_kwargs)
+        ctx = self.browser.new_context(storage_state=self.storage_state, **context_kwargs)
+        ctx.route('**/*', self.cache.handle)
+        return ctx
+
+
+class AsyncPageFixtures:
+    """Async counterpart of PageFixtures, shared by every lane of a run."""
+
+    def __init__(self, browser, home: str, cache_external: bool = True):
+        self.browser = browser
+        self.home = home
+        self.cache = ResponseCache(home, cache_external)
+        self.storage_state = None
+        self.domain_url: str | None = None
+        self._warm = False
+        self._lock = asyncio.Lock()
+
+    async def warm(self, **context_kwargs) -> None:
+        async with self._lock:
+            if self._warm:
+                return
+            ctx = await self.browser.new_context(**context_kwargs)
+            try:
+                await ctx.route('**/*', self.cache.handle_async)
+                page = await ctx.new_page()
+                await page.goto(self.home, wait_until='domcontentloaded', timeout=30000)
+                await ui_waits.async_wait_for_initial_tools(page)
+                self.storage_state = await ctx.storage_state()
+                try:
+                    await page.click('.domain-card', timeout=15000)
+                    await page.wait_for_selector('.open-tool-btn', timeout=20000)
+                    self.domain_url = _domain_url(page.url)
+                except Exception:
+                    self.domain_url = None
+            finally:
+                await ctx.close()
+                self._warm = True
+
+    async def new_context(self, **context_kwargs):
+        await self.warm(**context_kwargs)
+        ctx = await self.browser.new_context(storage_state=self.storage_state, **context_kwargs)
+        await ctx.route('**/*', self.cache.handle_async)
+        return ctx
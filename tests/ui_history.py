@@ -0,0 +1,109 @@
+"""
+Retry-on-failure and a local outcome history for the UI test engines.
+
+retry_failures() re-runs failed cases (through the same engine callable) up to
+``retries`` more times each, spending at most ``budget`` re-runs per run. A
+case that fails and then passes is reported with ``flaky=True``.
+
+History keeps every attempt (status, duration) of every run in SQLite.
+Its flakiness score for a test is the flip rate of its pass/fail sequence over
+the last HISTORY_WINDOW runs, attempts in order: 0.0 for a test that always
+passes or always fails, 1.0 for one that alternates on every attempt. The
+runners write it to the ``flakiness`` column, which parse-test-failures.py
+uses to tell flaky failures from stable ones.
+"""
+
+from __future__ import annotations
+import os
+import sqlite3
+import subprocess
+import time
+from typing import Callable, Dict, List, Tuple
+
+HISTORY_PATH = os.path.join('tests', 'output', 'ui-history.sqlite')
+HISTORY_WINDOW = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    git_sha TEXT,
+    base_url TEXT
+);
+CREATE TABLE IF NOT EXISTS outcomes (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    test_id TEXT NOT NULL,
+    feature TEXT,
+    attempt INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    duration_ms REAL
+);
+CREATE INDEX IF NOT EXISTS outcomes_test ON outcomes(test_id, run_id);
+"""
+
+
+def retry_failures(run: Callable, plan, results, retries: int, budget: int | None = None):
+    """Re-run failed cases; returns (final results in plan order, [(attempt, result), ...])."""
+    attempts: List[Tuple[int, object]] = [(1, r) for r in results]
+    final = {r.id: r for r in results}
+    budget = float('inf') if budget is None else budget
+    for attempt in range(2, retries + 2):
+        failed = [tc for tc in plan if tc.id in final and final[tc.id].status == 'fail']
+        failed = failed[:int(min(len(failed), budget))]
+        if not failed:
+            break
+        budget -= len(failed)
+        print(f'Retry {attempt - 1}/{retries}: re-running {len(failed)} failed case(s)')
+        for r in run(failed):
+            r.attempts = attempt
+            r.flaky = r.status != 'fail'
+            attempts.append((attempt, r))
+            final[r.id] = r
+    return [final[tc.id] for tc in plan if tc.id in final], attempts
+
+
+def _git_sha() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flip_rate(statuses: List[str]) -> float:
+    seq = [s for s in statuses if s in ('pass', 'fail')]
+    if len(seq) < 2:
+        return 0.0
+    return sum(a != b for a, b in zip(seq, seq[1:])) / (len(seq) - 1)
+
+
+class History:
+    def __init__(self, path: str = HISTORY_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def record(self, attempts, base_url: str = '') -> int:
+        with self.db:
+            run_id = self.db.execute('INSERT INTO runs (started_at, git_sha, base_url) VALUES (?, ?, ?)',
+                                     (time.time(), _git_sha(), base_url)).lastrowid
+            self.db.executemany(
+                'INSERT INTO outcomes (run_id, test_id, feature, attempt, status, duration_ms) VALUES (?, ?, ?, ?, ?, ?)',
+                [(run_id, r.id, r.feature, attempt, r.status, getattr(r, 'duration_ms', None))
+                 for attempt, r in attempts])
+        return run_id
+
+    def scores(self, test_ids, window: int = HISTORY_WINDOW) -> Dict[str, float]:
+        """Flakiness score per test over its last ``window`` runs."""
+        out: Dict[str, float] = {}
+        for test_id in test_ids:
+            rows = self.db.execute(
+                'SELECT status FROM outcomes WHERE test_id = ? AND run_id IN '
+                '(SELECT DISTINCT run_id FROM outcomes WHERE test_id = ? ORDER BY run_id DESC LIMIT ?) '
+                'ORDER BY run_id, attempt', (test_id, test_id, window)).fetchall()
+            out[test_id] = round(flip_rate([s for (s,) in rows]), 3)
+        return out
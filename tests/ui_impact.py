@@ -0,0 +1,78 @@
+"""
+Test impact selection for the UI harness (``run_ui_tests.py --changed RANGE``).
+
+FEATURE_SOURCES maps repository paths (fnmatch patterns, relative to the repo
+root) to the plan features that exercise them. The files changed in a git diff
+range are matched against it and the resulting feature list is fed through the
+normal --features filter. index.html is the whole single-page app, and changes
+to the harness itself can affect any case, so both select every feature;
+files no pattern covers (docs, ml/, scripts/, workflows) select nothing.
+"""
+
+from __future__ import annotations
+import fnmatch
+import os
+import subprocess
+from typing import Dict, Iterable, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ALL = '*'
+
+CATALOG = ['Search', 'Category Filter', 'Domain Navigation', 'Tool Details', 'Filter Dropdown', 'Favorites']
+FIREBASE = ['Auth', 'Favorites', 'Admin Moderation']
+
+FEATURE_SOURCES: Dict[str, List[str]] = {
+    # The SPA and everything it loads on every page
+    'index.html': [ALL],
+    'public/prompt-enhancer.js': [ALL],
+    # Harness
+    'tests/run_ui_tests*.py': [ALL],
+    'tests/ui_*.py': [ALL],
+    'tests/ui_plan.json': [ALL],
+    'tests/requirements.txt': [ALL],
+    # Catalog data rendered by search, filters, domain pages and tool details
+    'public/tools.json': CATALOG,
+    'public/popularity.json': CATALOG,
+    'public/popularity_ranks.json': CATALOG,
+    'data/domain-slug-aliases.json': CATALOG,
+    'public/icons/*': ['Domain Navigation', 'Tool Details'],
+    'images/*': ['Background Fix', 'Domain Navigation'],
+    # Admin moderation views and their data
+    'public/admin.html': ['Admin Moderation'],
+    'public/approve.html': ['Admin Moderation'],
+    'data/pending-tools.scored.json': ['Admin Moderation'],
+    # Auth, Firestore rules and hosting config
+    'firebase.json': FIREBASE + ['Legacy Cleanup'],
+    'firestore.indexes.json': FIREBASE,
+    'security-rules.txt': FIREBASE,
+    # Serverless admin endpoints and legacy paths
+    'netlify.toml': ['Admin Health Endpoint', 'Admin Dispatch Endpoint', 'Legacy Cleanup'],
+    'netlify/functions/*health*': ['Admin Health Endpoint'],
+    'netlify/functions/*dispatch*': ['Admin Dispatch Endpoint'],
+    'public/index.html': ['Legacy Cleanup'],
+}
+
+
+def changed_files(diff_range: str, root: str = REPO_ROOT) -> List[str]:
+    """Paths changed in ``diff_range`` (anything ``git diff`` accepts, e.g.
+    ``origin/main...HEAD``; a single ref also includes uncommitted changes)."""
+    try:
+        out = subprocess.run(['git', 'diff', '--name-only', diff_range], cwd=root,
+                             capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        detail = getattr(e, 'stderr', '') or str(e)
+        raise SystemExit(f'git diff --name-only {diff_range} failed: {detail.strip()}')
+    return [line.strip() for line in out.splitlines() if line.strip()]
+
+
+def affected_features(paths: Iterable[str], available: List[str]) -> Dict[str, List[str]]:
+    """Feature -> changed paths that selected it (only features in ``available``)."""
+    hits: Dict[str, List[str]] = {}
+    for path in paths:
+        for pattern, features in FEATURE_SOURCES.items():
+            if not fnmatch.fnmatch(path, pattern):
+                continue
+            for feature in (available if ALL in features else features):
+                if feature in available and path not in hits.setdefault(feature, []):
+                    hits[feature].append(path)
+    return {f: hits[f] for f in available if f in hits}
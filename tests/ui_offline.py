@@ -0,0 +1,296 @@
+"""
+Local, offline mode for the UI test engines (``run_ui_tests.py --local``).
+
+- serve_repo() serves the repository root (index.html, public/, images/ ...)
+  from an in-process HTTP server on an ephemeral localhost port, so the run no
+  longer depends on a deployed site.
+- OfflineBrowser wraps the Playwright browser so every context it creates
+  answers requests to other origins from local fixtures: tailwind, fuse.js,
+  fonts and the Firebase SDK from tests/fixtures/offline/, and any image not
+  found there (tool icons on Wikimedia, twimg, duckduckgo, placehold.co ...)
+  with a 1x1 placeholder. Everything else off-origin is aborted, so a run never
+  touches the network.
+
+Fixtures are recorded once with ``--record-fixtures`` (needs network): missing
+off-origin GETs are fetched, stored as <host>/<sha1>.body plus a .json sidecar
+holding the URL and content type, and served from disk on later runs.
+
+The scripts and stylesheets index.html loads from CDNs must be recorded for
+--local to start (required_assets()/missing_fixtures()). With
+``--offline-stubs`` (OfflineConfig.stubs) the ones without a recording are
+answered by stand-ins instead: a tailwind that only emits the display
+utilities (hidden, md:flex, ...), an empty Inter font stylesheet, and a
+fuse.js that leaves ``Fuse`` undefined so the app uses its substring search.
+That is a different app from production, so stub_skips() names the cases that
+depend on the real asset (STUB_DEPENDENT_CASES) and the run reports them as
+skipped rather than passing or failing them against the stand-in.
+"""
+
+from __future__ import annotations
+import base64
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from dataclasses import dataclass
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'offline')
+PLACEHOLDER_PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII=')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg', '.ico', '.avif')
+# <script src> and stylesheet <link href> on other origins in the page head.
+_HEAD_ASSET = re.compile(
+    r'<script[^>]*\ssrc="(https?://[^"]+)"|<link(?=[^>]*rel="stylesheet")[^>]*\shref="(https?://[^"]+)"')
+
+_BREAKPOINTS = (('', None), ('sm', 640), ('md', 768), ('lg', 1024), ('xl', 1280), ('2xl', 1536))
+_DISPLAY = {'hidden': 'none', 'block': 'block', 'inline-block': 'inline-block', 'inline': 'inline',
+            'flex': 'flex', 'inline-flex': 'inline-flex', 'grid': 'grid', 'table': 'table'}
+
+
+# Cases whose outcome depends on the real asset behind a stub: layout, scrolling
+# and dark-mode colours need Tailwind, the search cases need Fuse's matching.
+STUB_DEPENDENT_CASES = {
+    'tailwind': ('FD-005', 'FD-006', 'FD-M*'),
+    'fuse': ('SR-*',),
+}
+
+
+def _stub_kind(url: str):
+    host = urlsplit(url).netloc
+    if host == 'cdn.tailwindcss.com':
+        return 'tailwind'
+    if host == 'fonts.googleapis.com':
+        return 'fonts'
+    if 'fuse.js' in url:
+        return 'fuse'
+    return None
+
+
+def _tailwind_stub() -> str:
+    rules = ['.invisible{visibility:hidden}', '.visible{visibility:visible}',
+             '.sr-only{position:absolute;width:1px;height:1px;padding:0;margin:-1px;overflow:hidden;'
+             'clip:rect(0,0,0,0);white-space:nowrap;border-width:0}']
+    for prefix, width in _BREAKPOINTS:
+        block = ''.join(f'.{prefix}\\:{cls}{{display:{value}}}' if prefix else f'.{cls}{{display:{value}}}'
+                        for cls, value in _DISPLAY.items())
+        rules.append(f'@media (min-width:{width}px){{{block}}}' if width else block)
+    css = ''.join(rules)
+    return ('/* Offline stub for cdn.tailwindcss.com (tests/ui_offline.py): display utilities only. */\n'
+            'window.tailwind = window.tailwind || {config: {}};\n'
+            '(function () {\n'
+            '  var style = document.createElement("style");\n'
+            f'  style.textContent = {json.dumps(css)};\n'
+            '  document.head.appendChild(style);\n'
+            '})();\n')
+
+
+def _stub_body(url: str):
+    """(content_type, body) of the offline stand-in for a page-head asset, or None."""
+    kind = _stub_kind(url)
+    if kind == 'tailwind':
+        return 'application/javascript', _tailwind_stub().encode('utf-8')
+    if kind == 'fonts':
+        return 'text/css', b'/* Offline stub: no web fonts, the system font stack applies. */\n'
+    if kind == 'fuse':
+        return 'application/javascript', (b'/* Offline stub: Fuse is left undefined, so index.html falls back '
+                                          b'to substring search. */\n')
+    return None
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The browser drops connections for aborted/cancelled loads.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve_repo(root: str = REPO_ROOT, host: str = '127.0.0.1', port: int = 0):
+    """Start a threaded static server for ``root``; returns (server, base_url).
+
+    Call ``server.shutdown()`` when done.
+    """
+    server = _Server((host, port), partial(_QuietHandler, directory=root))
+    threading.Thread(target=server.serve_forever, name='ui-static-server', daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+def required_assets(root: str = REPO_ROOT, page: str = 'index.html'):
+    """Off-origin scripts and stylesheets ``page`` loads from its markup."""
+    with open(os.path.join(root, page), encoding='utf-8') as f:
+        html = f.read()
+    return [a or b for a, b in _HEAD_ASSET.findall(html)]
+
+
+def missing_fixtures(config: 'OfflineConfig', root: str = REPO_ROOT):
+    """Required assets with neither a recording nor (with ``config.stubs``) a stub."""
+    routes = OfflineRoutes(config)
+    return [url for url in required_assets(root) if routes.lookup(url) is None]
+
+
+def stubbed_assets(config: 'OfflineConfig', root: str = REPO_ROOT):
+    """Required assets this run answers with a stand-in instead of a recording."""
+    if not config.stubs:
+        return []
+    routes = OfflineRoutes(config)
+    return [url for url in required_assets(root) if routes.recorded(url) is None and _stub_body(url) is not None]
+
+
+def stub_skips(config: 'OfflineConfig', case_ids, root: str = REPO_ROOT):
+    """{case id: stubbed asset URL} for the cases that need the real asset."""
+    skips = {}
+    for url in stubbed_assets(config, root):
+        patterns = STUB_DEPENDENT_CASES.get(_stub_kind(url), ())
+        for case_id in case_ids:
+            if case_id not in skips and any(fnmatch.fnmatchcase(case_id, p) for p in patterns):
+                skips[case_id] = url
+    return skips
+
+
+@dataclass
+class OfflineConfig:
+    """Picklable settings handed to --workers processes."""
+    origin: str
+    fixtures_dir: str = FIXTURES_DIR
+    record: bool = False
+    stubs: bool = False  # answer unrecorded page-head assets with _stub_body()
+
+
+class OfflineRoutes:
+    def __init__(self, config: OfflineConfig):
+        self.config = config
+        self.origin = '{0.scheme}://{0.netloc}'.format(urlsplit(config.origin))
+        self.served = 0
+        self.placeholders = 0
+        self.blocked = 0
+
+    def _path(self, url: str) -> str:
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.config.fixtures_dir, urlsplit(url).netloc or '_', digest)
+
+    def lookup(self, url: str):
+        """(content_type, body) for a recorded URL, else its stub (with
+        ``config.stubs``), or None."""
+        hit = self.recorded(url)
+        if hit is None and self.config.stubs:
+            hit = _stub_body(url)
+        return hit
+
+    def recorded(self, url: str):
+        """(content_type, body) for a recorded URL, or None."""
+        path = self._path(url)
+        try:
+            with open(path + '.json', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(path + '.body', 'rb') as f:
+                return meta.get('content_type') or 'application/octet-stream', f.read()
+        except OSError:
+            return None
+
+    def store(self, url: str, content_type: str, body: bytes) -> None:
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for suffix, data in (('.body', body),
+                             ('.json', json.dumps({'url': url, 'content_type': content_type}).encode('utf-8'))):
+            tmp = f'{path}{suffix}.tmp{os.getpid()}'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path + suffix)
+
+    def decide(self, request):
+        """('local' | 'fixture' | 'placeholder' | 'record' | 'block', payload)."""
+        url = request.url.split('#', 1)[0]
+        if url.startswith(self.origin) or url.startswith('data:') or url.startswith('blob:'):
+            return 'local', None
+        if request.method == 'GET':
+            hit = self.lookup(url)
+            if hit is not None:
+                return 'fixture', hit
+            if self.config.record:
+                return 'record', url
+            if request.resource_type == 'image' or urlsplit(url).path.lower().endswith(IMAGE_EXTENSIONS):
+                return 'placeholder', None
+        return 'block', None
+
+    def handle(self, route) -> None:
+        action, payload = self.decide(route.request)
+        if action == 'local':
+            route.fallback()
+        elif action == 'fixture':
+            self.served += 1
+            route.fulfill(status=200, content_type=payload[0], body=payload[1],
+                          headers={'access-control-allow-origin': '*'})
+        elif action == 'record':
+            response = route.fetch()
+            body = response.body()
+            if response.status == 200:
+                self.store(payload, response.headers.get('content-type', ''), body)
+            route.fulfill(response=response, body=body)
+        elif action == 'placeholder':
+            self.placeholders += 1
+            route.fulfill(status=200, content_type='image/png', body=PLACEHOLDER_PNG)
+        else:
+            self.blocked += 1
+            route.abort('internetdisconnected')
+
+    async def handle_async(self, route) -> None:
+        action, payload = self.decide(route.request)
+        if action == 'local':
+            await route.fallback()
+        elif action == 'fixture':
+            self.served += 1
+            await route.fulfill(status=200, content_type=payload[0], body=payload[1],
+                                headers={'access-control-allow-origin': '*'})
+        elif action == 'record':
+            response = await route.fetch()
+            body = await response.body()
+            if response.status == 200:
+                self.store(payload, response.headers.get('content-type', ''), body)
+            await route.fulfill(response=response, body=body)
+        elif action == 'placeholder':
+            self.placeholders += 1
+            await route.fulfill(status=200, content_type='image/png', body=PLACEHOLDER_PNG)
+        else:
+            self.blocked += 1
+            await route.abort('internetdisconnected')
+
+
+class OfflineBrowser:
+    """Browser proxy whose new_context() installs the offline routes first.
+
+    Routes registered later on the same context (the fixture cache) run before
+    these and fall back to them for off-origin requests.
+    """
+
+    def __init__(self, browser, config: OfflineConfig):
+        self._browser = browser
+        self.routes = OfflineRoutes(config)
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+    def new_context(self, **kwargs):
+        ctx = self._browser.new_context(**kwargs)
+        ctx.route('**/*', self.routes.handle)
+        return ctx
+
+
+class AsyncOfflineBrowser(OfflineBrowser):
+    async def new_context(self, **kwargs):
+        ctx = await self._browser.new_context(**kwargs)
+        await ctx.route('**/*', self.routes.handle_async)
+        return ctx
+
@@ -0,0 +1,174 @@
+"""
+Screenshot policy for the UI test engines.
+
+``always`` keeps the old behaviour (one capture per shot() call),
+``on-failure`` still captures at every shot() call, so the image shows the page
+at the failing step even if the case closes that page afterwards, but holds the
+raw bytes until the case is over and only encodes and writes them if one of its
+results failed, and ``never`` skips them. Captures can be viewport-only instead
+of full page, and stored as PNG, JPEG or WebP.
+
+The browser hands back raw PNG bytes on the test thread; converting them
+(Pillow) and writing the file happens on a background thread, so the next step
+of the case does not wait for the encoder or the disk. Without Pillow, JPEG is
+encoded by the browser instead and WebP is unavailable.
+"""
+
+from __future__ import annotations
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # optional: only needed to re-encode on the background thread
+    Image = None
+
+POLICIES = ('always', 'on-failure', 'never')
+FORMATS = ('png', 'jpeg', 'webp')
+EXTENSIONS = {'png': '.png', 'jpeg': '.jpg', 'webp': '.webp'}
+
+
+@dataclass
+class ShotOptions:
+    """Picklable settings handed to --workers processes."""
+    policy: str = 'always'
+    full_page: bool = True
+    format: str = 'png'
+    quality: int = 80
+
+    def check(self) -> None:
+        if self.format == 'webp' and Image is None:
+            raise SystemExit('--screenshot-format webp needs Pillow (pip install Pillow).')
+
+
+class Screenshots:
+    """Captures for one sequence of cases (a sync run or one async lane)."""
+
+    def __init__(self, shots_dir: str, options: ShotOptions | None = None):
+        self.dir = shots_dir
+        self.options = options or ShotOptions()
+        self._pool = ThreadPoolExecutor(1, thread_name_prefix='shot-encode')
+        self._futures = []
+        self._pending: List[Tuple[str, bytes]] = []
+
+    def path(self, name: str) -> str:
+        safe = name.replace(' ', '_').replace('/', '_')
+        return os.path.join(self.dir, safe + EXTENSIONS[self.options.format])
+
+    def _screenshot_kwargs(self) -> dict:
+        kwargs = {'full_page': self.options.full_page}
+        if self.options.format == 'jpeg' and Image is None:
+            kwargs.update(type='jpeg', quality=self.options.quality)
+        return kwargs
+
+    def _encode_and_write(self, path: str, raw: bytes) -> None:
+        fmt = self.options.format
+        data = raw
+        if Image is not None and fmt != 'png':
+            img = Image.open(io.BytesIO(raw))
+            if fmt == 'jpeg':
+                img = img.convert('RGB')
+            buf = io.BytesIO()
+            img.save(buf, format=fmt.upper(), quality=self.options.quality)
+            data = buf.getvalue()
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    # Sync API -------------------------------------------------------------
+    def capture(self, name: str, page) -> str:
+        """Path the screenshot is (or, for on-failure, may be) written to."""
+        if self.options.policy == 'never':
+            return ''
+        path = self.path(name)
+        self._keep(path, page.screenshot(**self._screenshot_kwargs()))
+        return path
+
+    def _keep(self, path: str, raw: bytes) -> None:
+        if self.options.policy == 'on-failure':
+            self._pending.append((path, raw))
+        else:
+            self._write(path, raw)
+
+    def _write(self, path: str, raw: bytes) -> None:
+        self._futures.append(self._pool.submit(self._encode_and_write, path, raw))
+
+    def settle(self, results) -> None:
+        """End of a case: write its held captures if it failed, otherwise drop
+        them and clear the paths. Shared by both engines.
+
+        A failing case on a page the case closes (``landscape``) keeps its file:
+
+        >>> import tempfile, ui_steps
+        >>> from types import SimpleNamespace
+        >>> class Page:
+        ...     closed = False
+        ...     def screenshot(self, **kwargs):
+        ...         if self.closed:
+        ...             raise RuntimeError('Target page, context or browser has been closed')
+        ...         return b'raw png'
+        >>> class Session:  # what run_case needs of run_ui_tests.Session
+        ...     base_url, home = 'http://localhost', 'http://localhost/'
+        ...     def __init__(self, camera):
+        ...         self.camera, self.pages, self.results = camera, {}, []
+        ...     def page(self, kind):
+        ...         return self.pages.setdefault(kind, Page())
+        ...     def record(self, status, details, page, shot=None):
+        ...         path = self.camera.capture(shot or 'LS-1', page)
+        ...         self.results.append(SimpleNamespace(status=status, screenshot=path))
+        ...     def discard(self, kind):
+        ...         self.pages.pop(kind).closed = True
+        >>> out = tempfile.mkdtemp()
+        >>> t = Session(Screenshots(out, ShotOptions('on-failure')))
+        >>> case = SimpleNamespace(id='LS-1', page='landscape', on_error='fail',
+        ...                        script=[{'step': 'record', 'ok': 'False'}])
+        >>> ui_steps.run_case(ui_steps.compile_case(case), t)
+        >>> t.pages
+        {}
+        >>> t.camera.settle(t.results)
+        >>> t.camera.close(t.results)
+        >>> [os.path.basename(r.screenshot) for r in t.results], os.listdir(out)
+        (['LS-1.png'], ['LS-1.png'])
+        """
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        kept = set()
+        if any(r.status == 'fail' for r in results):
+            for path, raw in pending:
+                self._write(path, raw)
+                kept.add(path)
+        for r in results:
+            if r.screenshot and r.screenshot not in kept:
+                r.screenshot = ''
+
+    def close(self, results) -> None:
+        """Wait for pending writes and record the size of each result's file."""
+        self._pool.shutdown(wait=True)
+        for fut in self._futures:
+            fut.result()
+        for r in results:
+            if r.screenshot and os.path.exists(r.screenshot):
+                r.screenshot_bytes = os.path.getsize(r.screenshot)
+
+    # Async API ------------------------------------------------------------
+    async def capture_async(self, name: str, page) -> str:
+        if self.options.policy == 'never':
+            return ''
+        path = self.path(name)
+        self._keep(path, await page.screenshot(**self._screenshot_kwargs()))
+        return path
+
+    async def settle_async(self, results) -> None:
+        # Nothing left to await: the captures were taken at shot() time.
+        self.settle(results)
+
+
+def summarize(results) -> str:
+    """Files kept, bytes written and time spent capturing (the shot_ms spans)."""
+    count = sum(1 for r in results if r.screenshot)
+    size = sum(r.screenshot_bytes for r in results)
+    capture = sum(r.shot_ms for r in results)
+    return f'Screenshots: {count} files, {size / 2 ** 20:.1f} MiB, {capture / 1000:.1f}s capturing'
@@ -0,0 +1,728 @@
+"""
+Declarative test plan and step primitives for the UI test engines.
+
+The plan (tests/ui_plan.json, or a YAML file with the same shape) lists every
+case's metadata plus a ``script``: a list of steps such as
+
+    {"step": "open_filter"},
+    {"step": "eval", "js": "$filter_menu_visible", "as": "visible"},
+    {"step": "record", "ok": "visible", "details": "dropdown_visible={visible}"}
+
+Each step names a primitive registered below (with a sync and an async
+implementation, so both engines run the same scripts). compile_plan() checks
+every step against its primitive once (``$name`` arguments were already
+replaced by the plan's shared ``snippets`` when it was read) and compiles the Python expressions (``ok``, ``skip``, ``if``, ``arg``, ``expr``)
+and f-string templates (``details``, ``shot``, ``selector``, ``url``,
+``value``) into code objects. Running a case is then a loop over
+(primitive, arguments) pairs with no per-run closure building, and only the
+cases selected by --features/--ids (or a worker's shard) are compiled.
+
+Step keys shared by every primitive:
+  if  expression; the step is skipped when false
+  as  variable name (or list of names to unpack) for the primitive's result
+
+Expressions see the case's variables, ``base_url``, ``home`` and a small set of
+builtins (len, str, int, any, now(), ...). ``record`` appends the case's
+TestResult: status is ``status`` if given, else pass when ``ok`` holds, skipped
+when ``skip`` holds, fail otherwise; ``stop`` ends the script.
+"""
+
+from __future__ import annotations
+import asyncio
+import inspect
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Tuple
+
+import ui_waits
+
+PLAN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ui_plan.json')
+
+VIEWPORTS = {
+    'mobile': dict(viewport={'width': 375, 'height': 667}, device_scale_factor=2, has_touch=True),
+    'landscape': dict(viewport={'width': 667, 'height': 375}, device_scale_factor=2, has_touch=True),
+    'desktop': dict(viewport={'width': 1366, 'height': 768}),
+}
+# Pages kept between cases when fixtures are off; others are closed after their case.
+PERSISTENT_PAGES = ('mobile', 'desktop')
+
+EXPRESSION_BUILTINS = {
+    'abs': abs, 'all': all, 'any': any, 'bool': bool, 'dict': dict, 'float': float, 'int': int,
+    'isinstance': isinstance, 'len': len, 'list': list, 'max': max, 'min': min, 'round': round,
+    'str': str, 'tuple': tuple, 'now': time.time,
+}
+META_KEYS = ('step', 'if', 'as')
+
+
+class PlanError(ValueError):
+    """A plan file or case script that does not compile."""
+
+
+# ---------------------------------------------
+# Plan loading
+# ---------------------------------------------
+def read_plan(path: str = PLAN_PATH) -> Dict[str, Any]:
+    """Plan document from a .json or .yaml/.yml file, with ``$name`` step
+    arguments replaced by the document's ``snippets`` (shared JS)."""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise SystemExit(f'{path}: YAML plans need PyYAML (pip install pyyaml); JSON works without it.')
+            doc = yaml.safe_load(f)
+        else:
+            doc = json.load(f)
+    if not isinstance(doc, dict) or not isinstance(doc.get('cases'), list):
+        raise PlanError(f'{path}: expected an object with a "cases" list')
+    snippets = doc.get('snippets') or {}
+    for case in doc['cases']:
+        for i, step in enumerate(case.get('script') or []):
+            for key, value in step.items():
+                if isinstance(value, str) and re.fullmatch(r'\$\w+', value):
+                    if value[1:] not in snippets:
+                        raise PlanError(f'{path}: {case.get("id")} step {i + 1}: unknown snippet {value}')
+                    step[key] = snippets[value[1:]]
+    return doc
+
+
+# ---------------------------------------------
+# Primitive registry
+# ---------------------------------------------
+@dataclass
+class Primitive:
+    name: str
+    run: Callable
+    run_async: Callable | None = None
+    exprs: Tuple[str, ...] = ()
+    templates: Tuple[str, ...] = ()
+    lazy: Tuple[str, ...] = ()  # templates handed to the primitive unevaluated
+    params: Tuple[str, ...] = ()
+    required: Tuple[str, ...] = ()
+
+
+PRIMITIVES: Dict[str, Primitive] = {}
+
+
+def primitive(name: str, exprs: Tuple[str, ...] = (), templates: Tuple[str, ...] = (),
+              lazy: Tuple[str, ...] = ()):
+    """Register the sync implementation of step ``name``.
+
+    Implementations take (t, run, **args): ``t`` is the engine's Session or
+    Lane, ``run`` the CaseRun (page and script variables). ``exprs`` and
+    ``templates`` name the arguments compiled as expressions / f-strings.
+    """
+    def register(fn):
+        sig = list(inspect.signature(fn).parameters.values())[2:]
+        PRIMITIVES[name] = Primitive(
+            name, fn, exprs=exprs, templates=templates, lazy=lazy,
+            params=tuple(p.name for p in sig),
+            required=tuple(p.name for p in sig if p.default is inspect.Parameter.empty))
+        return fn
+    return register
+
+
+def async_primitive(name: str):
+    """Register the async twin of an already registered step."""
+    def register(fn):
+        PRIMITIVES[name].run_async = fn
+        return fn
+    return register
+
+
+# ---------------------------------------------
+# Compilation
+# ---------------------------------------------
+def _compile_expr(source: str, where: str):
+    try:
+        return compile(str(source), where, 'eval')
+    except SyntaxError as e:
+        raise PlanError(f'{where}: bad expression {source!r}: {e.msg}')
+
+
+def _compile_template(source: str, where: str):
+    source = str(source)
+    if '{' not in source:
+        return source
+    if '"""' in source or '\\' in source or source.endswith('"'):
+        raise PlanError(f'{where}: template {source!r} may not contain backslashes or end with a double quote')
+    return _compile_expr(f'f"""{source}"""', where)
+
+
+def _evaluate(code, run: 'CaseRun', **extra):
+    if not hasattr(code, 'co_code'):
+        return code
+    return eval(code, {'__builtins__': EXPRESSION_BUILTINS, **run.vars, **extra})
+
+
+@dataclass(frozen=True)
+class CompiledStep:
+    primitive: Primitive
+    literals: Tuple[Tuple[str, Any], ...]
+    computed: Tuple[Tuple[str, Any], ...]  # (arg, code object or plain string)
+    lazy: Tuple[Tuple[str, Any], ...] = ()
+    when: Any = None
+    out: Any = None
+
+    def arguments(self, run: 'CaseRun') -> Dict[str, Any]:
+        kwargs = dict(self.literals)
+        kwargs.update(self.lazy)
+        for name, code in self.computed:
+            kwargs[name] = _evaluate(code, run)
+        return kwargs
+
+    def store(self, run: 'CaseRun', value) -> None:
+        if isinstance(self.out, tuple):
+            run.vars.update(zip(self.out, value))
+        elif self.out:
+            run.vars[self.out] = value
+
+
+@dataclass(frozen=True)
+class CompiledCase:
+    id: str
+    page: str
+    on_error: str
+    steps: Tuple[CompiledStep, ...]
+
+
+def compile_step(raw: Dict[str, Any], where: str) -> CompiledStep:
+    if not isinstance(raw, dict) or 'step' not in raw:
+        raise PlanError(f'{where}: every step needs a "step" name')
+    prim = PRIMITIVES.get(raw['step'])
+    if prim is None:
+        raise PlanError(f'{where}: unknown step {raw["step"]!r} (known: {", ".join(sorted(PRIMITIVES))})')
+    args = {k: v for k, v in raw.items() if k not in META_KEYS}
+    unknown = set(args) - set(prim.params)
+    missing = set(prim.required) - set(args)
+    if unknown:
+        raise PlanError(f'{where}: {prim.name} takes no {", ".join(sorted(unknown))} (takes: {", ".join(prim.params)})')
+    if missing:
+        raise PlanError(f'{where}: {prim.name} needs {", ".join(sorted(missing))}')
+    literals, computed, lazy = [], [], []
+    for name, value in args.items():
+        if name in prim.exprs:
+            computed.append((name, _compile_expr(value, where)))
+        elif name in prim.templates and isinstance(value, str):
+            computed.append((name, _compile_template(value, where)))
+        elif name in prim.lazy and isinstance(value, str):
+            lazy.append((name, _compile_template(value, where)))
+        else:
+            literals.append((name, value))
+    out = raw.get('as')
+    return CompiledStep(prim, tuple(literals), tuple(computed), tuple(lazy),
+                        when=_compile_expr(raw['if'], where) if 'if' in raw else None,
+                        out=tuple(out) if isinstance(out, list) else out)
+
+
+def compile_case(tc) -> CompiledCase:
+    if tc.page not in VIEWPORTS:
+        raise PlanError(f'{tc.id}: unknown page {tc.page!r} (known: {", ".join(VIEWPORTS)})')
+    steps = tuple(compile_step(raw, f'{tc.id} step {i + 1}') for i, raw in enumerate(tc.script))
+    return CompiledCase(tc.id, tc.page, tc.on_error, steps)
+
+
+def compile_plan(plan) -> Dict[str, CompiledCase]:
+    """Compile the scripts of ``plan`` (cases without one have no entry)."""
+    return {tc.id: compile_case(tc) for tc in plan if tc.script}
+
+
+# ---------------------------------------------
+# Execution
+# ---------------------------------------------
+@dataclass
+class CaseRun:
+    """A case in progress: its page and script variables."""
+    page: Any
+    vars: Dict[str, Any] = field(default_factory=dict)
+    stopped: bool = False
+
+
+def _error_details(e: Exception) -> str:
+    return f'{type(e).__name__}: {str(e)}'[:200]
+
+
+def run_case(case: CompiledCase, t) -> None:
+    """Run one compiled case on a sync Session; an exception records
+    ``on_error`` with an ``<id>_error`` screenshot."""
+    run = None
+    try:
+        run = CaseRun(t.page(case.page), {'base_url': t.base_url, 'home': t.home})
+        for step in case.steps:
+            if run.stopped:
+                break
+            if step.when is not None and not _evaluate(step.when, run):
+                continue
+            step.store(run, step.primitive.run(t, run, **step.arguments(run)))
+    except Exception as e:
+        if run is None:
+            raise
+        t.record(case.on_error, _error_details(e), run.page, f'{case.id}_error')
+    finally:
+        if case.page not in PERSISTENT_PAGES:
+            t.discard(case.page)
+
+
+async def run_case_async(case: CompiledCase, t) -> None:
+    """Async twin of run_case() for a run_ui_tests_async.Lane."""
+    run = None
+    try:
+        run = CaseRun(await t.page(case.page), {'base_url': t.base_url, 'home': t.home})
+        for step in case.steps:
+            if run.stopped:
+                break
+            if step.when is not None and not _evaluate(step.when, run):
+                continue
+            step.store(run, await step.primitive.run_async(t, run, **step.arguments(run)))
+    except Exception as e:
+        if run is None:
+            raise
+        await t.record(case.on_error, _error_details(e), run.page, f'{case.id}_error')
+    finally:
+        if case.page not in PERSISTENT_PAGES:
+            await t.discard(case.page)
+
+
+# ---------------------------------------------
+# Primitives: navigation
+# ---------------------------------------------
+@primitive('goto_home')
+def goto_home(t, run):
+    with t.timer.span('goto', 'goto_home'):
+        run.page.goto(t.home, wait_until='domcontentloaded', timeout=30000)
+
+
+@async_primitive('goto_home')
+async def goto_home_async(t, run):
+    with t.timer.span('goto', 'goto_home'):
+        await run.page.goto(t.home, wait_until='domcontentloaded', timeout=30000)
+
+
+@primitive('goto_first_domain')
+def goto_first_domain(t, run):
+    """Tools view of the first domain (directly from the warm fixture URL when known)."""
+    page = run.page
+    if t.fixtures is not None and t.fixtures.domain_url:
+        with t.timer.span('goto', 'goto_tools_first_domain'):
+            page.goto(t.fixtures.domain_url, wait_until='domcontentloaded', timeout=30000)
+        page.wait_for_selector('.open-tool-btn', timeout=20000)
+        return
+    goto_home(t, run)
+    page.wait_for_selector('.domain-card', timeout=15000)
+    page.click('.domain-card', timeout=15000)
+    page.wait_for_selector('.open-tool-btn', timeout=20000)
+
+
+@async_primitive('goto_first_domain')
+async def goto_first_domain_async(t, run):
+    page = run.page
+    if t.fixtures is not None and t.fixtures.domain_url:
+        with t.timer.span('goto', 'goto_tools_first_domain'):
+            await page.goto(t.fixtures.domain_url, wait_until='domcontentloaded', timeout=30000)
+        await page.wait_for_selector('.open-tool-btn', timeout=20000)
+        return
+    await goto_home_async(t, run)
+    await page.wait_for_selector('.domain-card', timeout=15000)
+    await page.click('.domain-card', timeout=15000)
+    await page.wait_for_selector('.open-tool-btn', timeout=20000)
+
+
+@primitive('goto', templates=('url',))
+def goto(t, run, url, wait_until='load', timeout=15000):
+    with t.timer.span('goto', 'goto'):
+        run.page.goto(url, wait_until=wait_until, timeout=timeout)
+
+
+@async_primitive('goto')
+async def goto_async(t, run, url, wait_until='load', timeout=15000):
+    with t.timer.span('goto', 'goto'):
+        await run.page.goto(url, wait_until=wait_until, timeout=timeout)
+
+
+@primitive('reload')
+def reload(t, run, wait_until='domcontentloaded'):
+    with t.timer.span('goto', 'reload'):
+        run.page.reload(wait_until=wait_until)
+
+
+@async_primitive('reload')
+async def reload_async(t, run, wait_until='domcontentloaded'):
+    with t.timer.span('goto', 'reload'):
+        await run.page.reload(wait_until=wait_until)
+
+
+@primitive('open_filter')
+def open_filter(t, run, tap=False):
+    """Home page with the filter dropdown opened (click, or tap on touch pages)."""
+    page = run.page
+    goto_home(t, run)
+    page.wait_for_selector('#filter-button', timeout=10000)
+    with t.timer.span('click', 'open_filter'):
+        if tap:
+            page.tap('#filter-button', timeout=10000)
+        else:
+            page.click('#filter-button', timeout=10000)
+    time.sleep(0.5)
+
+
+@async_primitive('open_filter')
+async def open_filter_async(t, run, tap=False):
+    page = run.page
+    await goto_home_async(t, run)
+    await page.wait_for_selector('#filter-button', timeout=10000)
+    with t.timer.span('click', 'open_filter'):
+        if tap:
+            await page.tap('#filter-button', timeout=10000)
+        else:
+            await page.click('#filter-button', timeout=10000)
+    await asyncio.sleep(0.5)
+
+
+@primitive('search', templates=('query',))
+def search(t, run, query, fill_timeout=10000):
+    """Home page, tools loaded, ``query`` typed into the search bar."""
+    page = run.page
+    goto_home(t, run)
+    page.wait_for_selector('#search-bar-new', timeout=10000)
+    wait_tools(t, run)
+    if fill_timeout is None:
+        page.fill('#search-bar-new', query)
+    else:
+        page.fill('#search-bar-new', query, timeout=fill_timeout)
+
+
+@async_primitive('search')
+async def search_async(t, run, query, fill_timeout=10000):
+    page = run.page
+    await goto_home_async(t, run)
+    await page.wait_for_selector('#search-bar-new', timeout=10000)
+    await wait_tools_async(t, run)
+    if fill_timeout is None:
+        await page.fill('#search-bar-new', query)
+    else:
+        await page.fill('#search-bar-new', query, timeout=fill_timeout)
+
+
+# ---------------------------------------------
+# Primitives: waits (event-driven ones from ui_waits.py)
+# ---------------------------------------------
+@primitive('wait_tools')
+def wait_tools(t, run, timeout=20000):
+    with t.timer.span('wait', 'wait_for_initial_tools'):
+        return ui_waits.wait_for_initial_tools(run.page, timeout, t.waits)
+
+
+@async_primitive('wait_tools')
+async def wait_tools_async(t, run, timeout=20000):
+    with t.timer.span('wait', 'wait_for_initial_tools'):
+        return await ui_waits.async_wait_for_initial_tools(run.page, timeout, t.waits)
+
+
+@primitive('wait_search')
+def wait_search(t, run, expect=None, timeout=10000):
+    """(found, none, count) once the search results settled."""
+    with t.timer.span('wait', 'wait_for_search_resolution'):
+        return ui_waits.wait_for_search_resolution(run.page, expect, timeout, t.waits)
+
+
+@async_primitive('wait_search')
+async def wait_search_async(t, run, expect=None, timeout=10000):
+    with t.timer.span('wait', 'wait_for_search_resolution'):
+        return await ui_waits.async_wait_for_search_resolution(run.page, expect, timeout, t.waits)
+
+
+@primitive('wait_for', templates=('selector',))
+def wait_for(t, run, selector, state=None, timeout=10000):
+    """True once ``selector`` reached the state (default: visible)."""
+    kwargs = {'timeout': timeout}
+    if state:
+        kwargs['state'] = state
+    with t.timer.span('wait', 'wait_for'):
+        return run.page.wait_for_selector(selector, **kwargs) is not None
+
+
+@async_primitive('wait_for')
+async def wait_for_async(t, run, selector, state=None, timeout=10000):
+    kwargs = {'timeout': timeout}
+    if state:
+        kwargs['state'] = state
+    with t.timer.span('wait', 'wait_for'):
+        return await run.page.wait_for_selector(selector, **kwargs) is not None
+
+
+@primitive('sleep')
+def sleep(t, run, seconds):
+    with t.timer.span('wait', 'sleep'):
+        time.sleep(seconds)
+
+
+@async_primitive('sleep')
+async def sleep_async(t, run, seconds):
+    with t.timer.span('wait', 'sleep'):
+        await asyncio.sleep(seconds)
+
+
+# ---------------------------------------------
+# Primitives: input
+# ---------------------------------------------
+def _input_kwargs(timeout=None, position=None, no_wait_after=None) -> Dict[str, Any]:
+    return {k: v for k, v in (('timeout', timeout), ('position', position), ('no_wait_after', no_wait_after))
+            if v is not None}
+
+
+@primitive('click', templates=('selector',))
+def click(t, run, selector, timeout=None, position=None, no_wait_after=None, times=1, wait=False):
+    """Click ``selector`` ``times`` times; ``wait`` first waits for it to appear."""
+    kwargs = _input_kwargs(timeout, position, no_wait_after)
+    with t.timer.span('click', 'click'):
+        if wait:
+            run.page.wait_for_selector(selector, timeout=timeout or 10000)
+        for _ in range(times):
+            run.page.click(selector, **kwargs)
+
+
+@async_primitive('click')
+async def click_async(t, run, selector, timeout=None, position=None, no_wait_after=None, times=1, wait=False):
+    kwargs = _input_kwargs(timeout, position, no_wait_after)
+    with t.timer.span('click', 'click'):
+        if wait:
+            await run.page.wait_for_selector(selector, timeout=timeout or 10000)
+        for _ in range(times):
+            await run.page.click(selector, **kwargs)
+
+
+@primitive('tap', templates=('selector',))
+def tap(t, run, selector, timeout=None, no_wait_after=None, times=1):
+    kwargs = _input_kwargs(timeout, None, no_wait_after)
+    with t.timer.span('click', 'tap'):
+        for _ in range(times):
+            run.page.tap(selector, **kwargs)
+
+
+@async_primitive('tap')
+async def tap_async(t, run, selector, timeout=None, no_wait_after=None, times=1):
+    kwargs = _input_kwargs(timeout, None, no_wait_after)
+    with t.timer.span('click', 'tap'):
+        for _ in range(times):
+            await run.page.tap(selector, **kwargs)
+
+
+@primitive('fill', templates=('selector', 'value'))
+def fill(t, run, selector, value, timeout=None):
+    run.page.fill(selector, value, **_input_kwargs(timeout))
+
+
+@async_primitive('fill')
+async def fill_async(t, run, selector, value, timeout=None):
+    await run.page.fill(selector, value, **_input_kwargs(timeout))
+
+
+@primitive('focus', templates=('selector',))
+def focus(t, run, selector):
+    run.page.focus(selector)
+
+
+@async_primitive('focus')
+async def focus_async(t, run, selector):
+    await run.page.focus(selector)
+
+
+@primitive('press')
+def press(t, run, keys):
+    """Keyboard press of one key or a list of keys in order."""
+    for key in ([keys] if isinstance(keys, str) else keys):
+        run.page.keyboard.press(key)
+
+
+@async_primitive('press')
+async def press_async(t, run, keys):
+    for key in ([keys] if isinstance(keys, str) else keys):
+        await run.page.keyboard.press(key)
+
+
+@primitive('select', templates=('selector', 'value'))
+def select(t, run, selector, value):
+    run.page.select_option(selector, value)
+
+
+@async_primitive('select')
+async def select_async(t, run, selector, value):
+    await run.page.select_option(selector, value)
+
+
+@primitive('set_viewport')
+def set_viewport(t, run, width, height):
+    run.page.set_viewport_size({'width': width, 'height': height})
+
+
+@async_primitive('set_viewport')
+async def set_viewport_async(t, run, width, height):
+    await run.page.set_viewport_size({'width': width, 'height': height})
+
+
+# ---------------------------------------------
+# Primitives: reading the page
+# ---------------------------------------------
+@primitive('eval', exprs=('arg',))
+def evaluate(t, run, js, arg=None):
+    if arg is None:
+        return run.page.evaluate(js)
+    return run.page.evaluate(js, arg)
+
+
+@async_primitive('eval')
+async def evaluate_async(t, run, js, arg=None):
+    if arg is None:
+        return await run.page.evaluate(js)
+    return await run.page.evaluate(js, arg)
+
+
+@primitive('read', templates=('selector',))
+def read(t, run, selector, prop='inner_text', name=None):
+    """inner_text / inner_html / text_content of ``selector``, an attribute
+    (``prop: "attribute"`` with ``name``), ``exists`` or ``visible``."""
+    page = run.page
+    if prop == 'attribute':
+        return page.get_attribute(selector, name)
+    if prop == 'exists':
+        return page.query_selector(selector) is not None
+    if prop == 'visible':
+        return page.locator(selector).is_visible()
+    return getattr(page, prop)(selector)
+
+
+@async_primitive('read')
+async def read_async(t, run, selector, prop='inner_text', name=None):
+    page = run.page
+    if prop == 'attribute':
+        return await page.get_attribute(selector, name)
+    if prop == 'exists':
+        return await page.query_selector(selector) is not None
+    if prop == 'visible':
+        return await page.locator(selector).is_visible()
+    return await getattr(page, prop)(selector)
+
+
+@primitive('url')
+def url(t, run):
+    return run.page.url
+
+
+@async_primitive('url')
+async def url_async(t, run):
+    return run.page.url
+
+
+@primitive('let', exprs=('expr',))
+def let(t, run, expr):
+    return expr
+
+
+@async_primitive('let')
+async def let_async(t, run, expr):
+    return expr
+
+
+# ---------------------------------------------
+# Primitives: auth (no-ops without TEST_USER_EMAIL/TEST_USER_PASSWORD)
+# ---------------------------------------------
+def _credentials():
+    return os.environ.get('TEST_USER_EMAIL', '').strip(), os.environ.get('TEST_USER_PASSWORD', '').strip()
+
+
+@primitive('login')
+def login(t, run):
+    """True when signed in with the test credentials."""
+    email, pwd = _credentials()
+    if not email or not pwd:
+        return False
+    page = run.page
+    goto_home(t, run)
+    try:
+        if page.query_selector('#signout-btn'):
+            return True
+        click(t, run, '#signin-btn', timeout=10000, wait=True)
+        page.wait_for_selector('#auth-modal.visible', timeout=10000)
+        page.fill('#email-input', email, timeout=10000)
+        page.fill('#password-input', pwd, timeout=10000)
+        click(t, run, '#auth-submit-btn', timeout=10000, wait=True)
+        page.wait_for_selector('#auth-modal.visible', state='detached', timeout=20000)
+        page.wait_for_selector('#signout-btn', timeout=20000)
+        return True
+    except Exception:
+        return False
+
+
+@async_primitive('login')
+async def login_async(t, run):
+    email, pwd = _credentials()
+    if not email or not pwd:
+        return False
+    page = run.page
+    await goto_home_async(t, run)
+    try:
+        if await page.query_selector('#signout-btn'):
+            return True
+        await click_async(t, run, '#signin-btn', timeout=10000, wait=True)
+        await page.wait_for_selector('#auth-modal.visible', timeout=10000)
+        await page.fill('#email-input', email, timeout=10000)
+        await page.fill('#password-input', pwd, timeout=10000)
+        await click_async(t, run, '#auth-submit-btn', timeout=10000, wait=True)
+        await page.wait_for_selector('#auth-modal.visible', state='detached', timeout=20000)
+        await page.wait_for_selector('#signout-btn', timeout=20000)
+        return True
+    except Exception:
+        return False
+
+
+@primitive('signout')
+def signout(t, run):
+    """True when a signed-in session was signed out."""
+    page = run.page
+    try:
+        if page.query_selector('#signout-btn'):
+            click(t, run, '#signout-btn', timeout=10000, wait=True)
+            page.wait_for_selector('#signin-btn', timeout=20000)
+            return True
+    except Exception:
+        return False
+    return False
+
+
+@async_primitive('signout')
+async def signout_async(t, run):
+    page = run.page
+    try:
+        if await page.query_selector('#signout-btn'):
+            await click_async(t, run, '#signout-btn', timeout=10000, wait=True)
+            await page.wait_for_selector('#signin-btn', timeout=20000)
+            return True
+    except Exception:
+        return False
+    return False
+
+
+# ---------------------------------------------
+# Primitives: results
+# ---------------------------------------------
+def _result(run: CaseRun, details, status, ok, skip, shot, stop):
+    """(status, details, shot name) for record; ``details`` also sees ``passed``."""
+    if not status:
+        status = 'pass' if ok else ('skipped' if skip else 'fail')
+    run.stopped = bool(stop)
+    return status, str(_evaluate(details, run, passed=status == 'pass')), shot or None
+
+
+@primitive('record', exprs=('ok', 'skip'), templates=('shot',), lazy=('details',))
+def record(t, run, details='', status=None, ok=False, skip=False, shot=None, stop=False):
+    status, details, shot = _result(run, details, status, ok, skip, shot, stop)
+    t.record(status, details, run.page, shot)
+
+
+@async_primitive('record')
+async def record_async(t, run, details='', status=None, ok=False, skip=False, shot=None, stop=False):
+    status, details, shot = _result(run, details, status, ok, skip, shot, stop)
+    await t.record(status, details, run.page, shot)
@@ -0,0 +1,81 @@
+"""
+Per-test wall time and phase spans for the UI test engines.
+
+A CaseTimer is started before each case and finished after it. The helpers
+wrap themselves in ``timer.span(phase, name)``; phase totals land in the
+results CSV/Excel columns below, and every span (helper name, offset from the
+start of the case, duration) is kept for write_trace(). Spans of the same
+phase nest without being counted twice (e.g. goto_home inside
+goto_tools_first_domain).
+"""
+
+from __future__ import annotations
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+# Phase -> results column
+PHASES = {
+    'goto': 'goto_ms',
+    'click': 'click_ms',
+    'wait': 'wait_ms',
+    'shot': 'shot_ms',
+}
+TRACE_FILE = 'trace.json'
+
+
+class CaseTimer:
+    def __init__(self):
+        self.start()
+
+    def start(self) -> None:
+        self._t0 = time.perf_counter()
+        self._open: Dict[str, int] = {}
+        self.totals: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.spans: List[dict] = []
+
+    @contextmanager
+    def span(self, phase: str, name: str):
+        start = time.perf_counter()
+        self._open[phase] = self._open.get(phase, 0) + 1
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._open[phase] -= 1
+            if not self._open[phase]:
+                self.totals[phase] += end - start
+            self.spans.append({
+                'phase': phase,
+                'name': name,
+                'start_ms': round((start - self._t0) * 1000, 1),
+                'dur_ms': round((end - start) * 1000, 1),
+            })
+
+    def finish(self, results) -> None:
+        """Stamp wall time, phase totals and spans on the case's results."""
+        duration = round((time.perf_counter() - self._t0) * 1000, 1)
+        spans = sorted(self.spans, key=lambda s: s['start_ms'])
+        for r in results:
+            r.duration_ms = duration
+            for phase, column in PHASES.items():
+                setattr(r, column, round(self.totals[phase] * 1000, 1))
+            r.spans = spans
+
+
+def write_trace(results, out_dir: str) -> str:
+    """JSON trace: one entry per case with its wall time and spans."""
+    path = os.path.join(out_dir, TRACE_FILE)
+    cases = [{
+        'id': r.id,
+        'feature': r.feature,
+        'status': r.status,
+        'duration_ms': r.duration_ms,
+        'phases_ms': {phase: getattr(r, column) for phase, column in PHASES.items()},
+        'spans': r.spans,
+    } for r in results]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'total_ms': round(sum(r.duration_ms for r in results), 1), 'cases': cases}, f, indent=2)
+    return path
@@ -0,0 +1,158 @@
+"""
+Event-driven readiness waits shared by the sync and async UI test engines.
+
+The old helpers polled every 0.15 s and made three or four page.evaluate round
+trips per iteration. These hand one combined predicate to wait_for_function,
+which re-checks it inside the page on every animation frame and resolves as
+soon as it turns truthy, so a wait costs one round trip plus the time until the
+app actually flips.
+
+WaitStats keeps, per test, how long the waits took and an estimate of how long
+the polling loop would have needed for the same flip time (it samples at the
+start of every POLL_INTERVAL_S + N round trips and then pays N round trips to
+notice). The runners write that difference as wait_saved_ms.
+"""
+
+from __future__ import annotations
+import math
+import time
+
+from playwright.sync_api import TimeoutError as PWTimeout
+from playwright.async_api import TimeoutError as AsyncPWTimeout
+
+POLL_INTERVAL_S = 0.15
+
+# Same conditions the polling helper checked one evaluate at a time; index.html
+# sets window.__TOOLS_READY after its first render.
+TOOLS_READY_JS = """() => window.__TOOLS_READY === true
+    || !!document.querySelector('.open-tool-btn')
+    || !!window.__TOOLS_LOADED
+    || ((document.querySelector('#search-results-container') || {}).innerHTML || '').length > 50"""
+TOOLS_READY_EVALUATES = 4
+
+# Returns {count, none} for the current search results; with ``done`` set it
+# returns null until the state matches ``expect`` (true / false / null).
+SEARCH_STATE_JS = """([expect, done]) => {
+    const c = document.querySelector('#search-results-container');
+    const count = c ? Math.max(c.querySelectorAll('.open-tool-btn').length,
+                               c.querySelectorAll('.tool-result').length) : 0;
+    const none = !!c && (c.innerText || '').includes('No tools found');
+    const met = expect === true ? count >= 1 : expect === false ? none : (count >= 1 || none);
+    return (!done || met) ? { count, none } : null;
+}"""
+SEARCH_EVALUATES = 3
+
+
+class WaitStats:
+    """Wait time and estimated poll-loop savings for the current test."""
+
+    def __init__(self):
+        self.rtt_s: float | None = None
+        self.waited_s = 0.0
+        self.saved_s = 0.0
+
+    def add(self, elapsed_s: float, evaluates: int, met: bool) -> None:
+        self.waited_s += elapsed_s
+        if not met:
+            return  # both strategies run into the same timeout
+        rtt = self.rtt_s or 0.0
+        period = POLL_INTERVAL_S + evaluates * rtt
+        polled = math.ceil(elapsed_s / period) * period + evaluates * rtt
+        self.saved_s += max(0.0, polled - elapsed_s)
+
+    def take(self) -> float:
+        """Saved milliseconds since the last call (then reset for the next test)."""
+        saved, self.saved_s, self.waited_s = self.saved_s, 0.0, 0.0
+        return round(saved * 1000, 1)
+
+
+def _state(value) -> tuple[bool, bool, int]:
+    value = value or {}
+    count = int(value.get('count') or 0)
+    return count >= 1, bool(value.get('none')), count
+
+
+# ---------------------------------------------
+# Sync API
+# ---------------------------------------------
+def _measure_rtt(page, stats: WaitStats | None) -> None:
+    if stats is not None and stats.rtt_s is None:
+        t0 = time.perf_counter()
+        page.evaluate('0')
+        stats.rtt_s = time.perf_counter() - t0
+
+
+def wait_for_initial_tools(page, timeout_ms: int = 20000, stats: WaitStats | None = None) -> bool:
+    """Wait until some tool data is present (grid ready or search container populated)."""
+    _measure_rtt(page, stats)
+    t0 = time.perf_counter()
+    try:
+        page.wait_for_function(TOOLS_READY_JS, timeout=timeout_ms)
+        met = True
+    except PWTimeout:
+        met = False
+    if stats is not None:
+        stats.add(time.perf_counter() - t0, TOOLS_READY_EVALUATES, met)
+    return met
+
+
+def wait_for_search_resolution(page, expect_results: bool | None = None, timeout_ms: int = 10000,
+                               stats: WaitStats | None = None):
+    """Wait until search produces either results or a no-results message.
+
+    expect_results:
+      True  -> stop when >=1 result
+      False -> stop when 'No tools found' present
+      None  -> stop when either condition met
+    Returns (found_any, saw_no_results, count)
+    """
+    _measure_rtt(page, stats)
+    t0 = time.perf_counter()
+    try:
+        value = page.wait_for_function(SEARCH_STATE_JS, arg=[expect_results, True], timeout=timeout_ms).json_value()
+        met = True
+    except PWTimeout:
+        value = page.evaluate(SEARCH_STATE_JS, [expect_results, False])
+        met = False
+    if stats is not None:
+        stats.add(time.perf_counter() - t0, SEARCH_EVALUATES, met)
+    return _state(value)
+
+
+# ---------------------------------------------
+# Async API
+# ---------------------------------------------
+async def _measure_rtt_async(page, stats: WaitStats | None) -> None:
+    if stats is not None and stats.rtt_s is None:
+        t0 = time.perf_counter()
+        await page.evaluate('0')
+        stats.rtt_s = time.perf_counter() - t0
+
+
+async def async_wait_for_initial_tools(page, timeout_ms: int = 20000, stats: WaitStats | None = None) -> bool:
+    await _measure_rtt_async(page, stats)
+    t0 = time.perf_counter()
+    try:
+        await page.wait_for_function(TOOLS_READY_JS, timeout=timeout_ms)
+        met = True
+    except AsyncPWTimeout:
+        met = False
+    if stats is not None:
+        stats.add(time.perf_counter() - t0, TOOLS_READY_EVALUATES, met)
+    return met
+
+
+async def async_wait_for_search_resolution(page, expect_results: bool | None = None, timeout_ms: int = 10000,
+                                           stats: WaitStats | None = None):
+    await _measure_rtt_async(page, stats)
+    t0 = time.perf_counter()
+    try:
+        handle = await page.wait_for_function(SEARCH_STATE_JS, arg=[expect_results, True], timeout=timeout_ms)
+        value = await handle.json_value()
+        met = True
+    except AsyncPWTimeout:
+        value = await page.evaluate(SEARCH_STATE_JS, [expect_results, False])
+        met = False
+    if stats is not None:
+        stats.add(time.perf_counter() - t0, SEARCH_EVALUATES, met)
+    return _state(value)